@@ -1,57 +1,52 @@
 import os
-import json
-import tempfile
+import shutil
+import importlib
+import threading
 import streamlit as st
-import requests
-import arabic_reshaper
-from bidi.algorithm import get_display
-from PIL import Image, ImageDraw, ImageFont
-import numpy as np
-from moviepy.editor import (
-    VideoFileClip, AudioFileClip, ImageClip,
-    CompositeVideoClip
+from catalog import (
+    BASE_DIR, BACKGROUNDS_DIR, FONT_PATH, ENGLISH_QURAN, SURAH_LIST, RECITER_URLS,
+    parse_selection, selection_label
 )
-from moviepy.video.fx.loop import loop
+from timing import RenderReport
+from prefetch import PREFETCHER
+from reciter_manifest import preflight
 
-# ---------------- PROJECT SETUP ----------------
+# The render pipeline pulls in moviepy, numpy and PIL. Import it in the
+# background once per server process so the page draws without waiting.
+@st.cache_resource
+def prewarm_pipeline():
+    thread = threading.Thread(target=importlib.import_module, args=("pipeline",), daemon=True)
+    thread.start()
+    return thread
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+prewarm_pipeline()
 
-DATA_DIR = os.path.join(BASE_DIR, "Data")
-BACKGROUNDS_DIR = os.path.join(DATA_DIR, "Backgrounds")
-FONTS_DIR = os.path.join(DATA_DIR, "font")
+@st.cache_resource
+def load_search_index():
+    from search import get_index
+    return get_index()
 
-font_files = [f for f in os.listdir(FONTS_DIR) if f.lower().endswith(".ttf")]
-if not font_files:
-    raise FileNotFoundError("No TTF font found in Data/fonts/")
-FONT_PATH = os.path.join(FONTS_DIR, font_files[0])
-
-
-# ---------------- LOAD QURAN DATA ----------------
-with open(os.path.join(DATA_DIR, "quran_ar.json"), "r", encoding="utf-8") as f:
-    ARABIC_QURAN = json.load(f)
-
-with open(os.path.join(DATA_DIR, "quran_en.json"), "r", encoding="utf-8") as f:
-    ENGLISH_QURAN = json.load(f)
-
-with open(os.path.join(DATA_DIR, "surahs.txt"), "r", encoding="utf-8") as f:
-    SURAH_LIST = [line.strip() for line in f if line.strip()]
-
-# ---------------- RECITERS ----------------
-RECITER_URLS = {
-    "Sudais": "https://archive.org/download/quran-sudais-193/quran-sudais/",
-    "Shuraim": "https://archive.org/download/quran-shuraim-192/quran-shuraim-192/",
-    "Alafasy": "https://archive.org/download/quran-alafasy-192/quran-alafasy-192/",
-    "Yasir": "https://archive.org/download/quran-yasir-192/quran-yasir-192/",
-}
+def use_search_hit(surah, ayah):
+    # Runs before the rerun, so the widgets below pick up the new values
+    st.session_state.surah_choice = SURAH_LIST[surah-1]
+    st.session_state.ayah_range = str(ayah)
 
 # ---------------- STREAMLIT UI ----------------
 st.title("Quran Video Editor")
 
 with st.sidebar:
     st.header("User Controls")
+
+    query = st.text_input("Search Verses (e.g. lord of the w*)")
+    if query.strip():
+        hits = load_search_index().search(query, limit=10)
+        for s, a in hits:
+            preview = ENGLISH_QURAN[str(s)][a-1]["text"][:60]
+            st.button(f"{s}:{a} {preview}", key=f"hit_{s}_{a}", on_click=use_search_hit, args=(s, a))
+        if not hits:
+            st.caption("No matching verses")
     
-    surah_choice = st.selectbox("Choose Surah", SURAH_LIST)
+    surah_choice = st.selectbox("Choose Surah", SURAH_LIST, key="surah_choice")
     surah_num = int(surah_choice.split(".")[0].strip())
     
     reciter_choice = st.selectbox("Choose Reciter", list(RECITER_URLS.keys()))
@@ -59,7 +54,79 @@ with st.sidebar:
     background_files = [f for f in os.listdir(BACKGROUNDS_DIR) if f.lower().endswith(('.mp4','.mov'))]
     background_choice = st.selectbox("Choose Background", background_files)
     
-    ayah_range = st.text_input("Ayah Range (e.g 1-3)")
+    ayah_range = st.text_input("Ayah Range (e.g 1-3 or 2:255, 3:190-194)", key="ayah_range")
+    text_mode = st.radio("Verse Text", ["Burned in", "Subtitle track", "Hard subtitles (libass)",
+                                        "Overlay only (alpha)"],
+                         help="A subtitle track skips drawing text into every frame; "
+                              "an overlay is the verse track alone, for compositing in an editor")
+    if text_mode != "Overlay only (alpha)":
+        readability = st.multiselect("Readability", ["blur", "darken", "vignette"],
+                                     help="Blur or darken a band behind the text, or add a vignette; "
+                                          "applied once to the background loop and cached")
+        adaptive_color = st.checkbox("Adaptive text color", value=True,
+                                     help="Pick text colors and outline from the background's brightness")
+    else:
+        # The overlay never reads the background
+        readability = []
+        adaptive_color = False
+    if text_mode == "Burned in":
+        use_library = st.checkbox("Use ayah clip library", value=False,
+                                  help="Reuse pre-rendered clips of each ayah; the background restarts with every ayah. "
+                                       "Aspect ratios, shorts and verse effects are not available")
+        if use_library:
+            # Library clips are pre-rendered plain cards at the background's own framing
+            aspect_choices = []
+            split_shorts = False
+            visualizer = False
+            transition = "none"
+            karaoke = False
+        else:
+            aspect_choices = st.multiselect("Aspect Ratios (one pass)", ["16:9", "9:16", "1:1"],
+                                            help="Center-cropped renders in each ratio; leave empty for the background's own framing")
+            split_shorts = st.checkbox("Split into shorts", value=False,
+                                       help="Pack consecutive ayahs into clips under a length limit, in the first chosen ratio")
+            if split_shorts:
+                short_seconds = st.number_input("Max Clip Length (seconds)", min_value=5, value=60, step=5)
+            visualizer = st.checkbox("Audio visualizer", value=False,
+                                     help="Bars under the verse text that follow the recitation")
+            transition = st.selectbox("Verse Transition", ["none", "fade", "slide", "wipe", "word"],
+                                      help="How each verse card enters and leaves; word uncovers the Arabic one word at a time")
+            karaoke = st.checkbox("Highlight words", value=False,
+                                  help="Color each word as it is recited; needs words.json next to the reciter's mirror")
+        if split_shorts:
+            # Every short would repeat the cards; they open and close full renders only
+            title_card = bismillah_card = outro_card = False
+        else:
+            title_card = st.checkbox("Surah title card", value=False)
+            bismillah_card = st.checkbox("Bismillah card", value=False)
+            outro_card = st.checkbox("Outro card", value=False)
+    else:
+        aspect_choices = []
+        split_shorts = False
+        visualizer = False
+        transition = "none"
+        karaoke = False
+        title_card = bismillah_card = outro_card = False
+        use_library = False
+        if text_mode == "Overlay only (alpha)":
+            subtitle_format = None
+            overlay_format = st.selectbox("Overlay Format", ["prores", "qtrle", "webm", "png"],
+                                          help="ProRes 4444, QuickTime Animation, WebM VP9 or a PNG sequence")
+        else:
+            subtitle_format = st.selectbox("Subtitle Format", ["ass", "vtt", "srt"])
+
+# ---------------- AUDIO PREFETCH ----------------
+# Start fetching the selected ayahs while the user finishes choosing options
+try:
+    prefetch_ayahs = parse_selection(ayah_range, surah_num)
+except ValueError:
+    prefetch_ayahs = parse_selection("", surah_num)
+prefetch_key = (reciter_choice, tuple(prefetch_ayahs))
+if st.session_state.get("prefetch_key") != prefetch_key:
+    if "prefetch_job" in st.session_state:
+        st.session_state.prefetch_job.cancel()
+    st.session_state.prefetch_job = PREFETCHER.prefetch(reciter_choice, prefetch_ayahs)
+    st.session_state.prefetch_key = prefetch_key
 
 # ---------------- BACKGROUND PREVIEW ----------------
 bg_path = os.path.join(BACKGROUNDS_DIR, background_choice)
@@ -67,42 +134,6 @@ if os.path.exists(bg_path):
     st.subheader("Background Preview")
     st.video(bg_path)  # only preview selected background
 
-# ---------------- HELPER FUNCTIONS ----------------
-def get_audio_url(reciter, surah, verse):
-    return f"{RECITER_URLS[reciter]}{surah:03d}{verse:03d}.mp3"
-
-def download_audio(reciter, surah, start, end, progress_bar=None):
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-    total = end - start + 1
-    for i, verse in enumerate(range(start, end+1)):
-        url = get_audio_url(reciter, surah, verse)
-        r = requests.get(url, stream=True)
-        if r.status_code == 200:
-            for chunk in r.iter_content(chunk_size=1024*1024):
-                temp_file.write(chunk)
-        else:
-            raise Exception(f"Failed to download {url}")
-        if progress_bar:
-            progress_bar.progress((i+1)/total)
-    temp_file.flush()
-    return temp_file.name
-
-def prepare_text_images(surah_num, start, end, width, height, font_path):
-    arabic_verses = ARABIC_QURAN.get(str(surah_num), [])[start-1:end]
-    english_verses = ENGLISH_QURAN.get(str(surah_num), [])[start-1:end]
-    images = []
-    font = ImageFont.truetype(font_path, 50)
-    for a, e in zip(arabic_verses, english_verses):
-        reshaped = arabic_reshaper.reshape(a["text"])
-        bidi_text = get_display(reshaped)
-        img = Image.new("RGBA", (width, height), (0,0,0,0))
-        draw = ImageDraw.Draw(img)
-        draw.text((10,10), bidi_text, font=font, fill="white")           # Arabic
-        draw.text((10, height//2), e["text"], font=font, fill="gray")    # English
-        img_array = np.array(img)  # <-- Convert PIL Image to NumPy array
-        images.append(ImageClip(img_array))
-    return images
-
 # ---------------- UI: Buttons Side by Side ----------------
 col1, col2 = st.columns([1,1])
 with col1:
@@ -116,39 +147,104 @@ progress_bar = st.progress(0)
 # ---------------- VIDEO GENERATION ----------------
 if generate_clicked:
     try:
-        total_verses = len(ARABIC_QURAN.get(str(surah_num), []))
-        if ayah_range.strip():
-            parts = ayah_range.split("-")
-            start = int(parts[0])
-            end = int(parts[1]) if len(parts) > 1 else start
-            start = max(1, min(start, total_verses))
-            end = max(1, min(end, total_verses))
-            if start > end:
-                start, end = end, start
-        else:
-            start, end = 1, total_verses
+        from pipeline import build_video, write_video
+        from audio_track import build_audio_track
+        from readability import prepare_background
+        from contrast import background_palette
 
-        # Download audio
-        audio_path = download_audio(reciter_choice, surah_num, start, end, progress_bar)
-        audio_clip = AudioFileClip(audio_path)
+        # One ordered plan for the whole selection, even across surahs
+        ayahs = parse_selection(ayah_range, surah_num)
+        # Styled ASS survives only in MKV; MP4 converts soft subtitles to plain timed text
+        ext = ".mkv" if text_mode == "Subtitle track" and subtitle_format == "ass" else ".mp4"
+        output_path = os.path.join(BASE_DIR, f"surah_{selection_label(ayahs)}_{reciter_choice}{ext}")
+        report = RenderReport(os.path.basename(output_path))
 
-        # Background video
-        bg_clip = VideoFileClip(bg_path)
-        final_bg = loop(bg_clip, duration=audio_clip.duration)
+        # Fail fast if the reciter is missing any ayah in the selection
+        with report.span("preflight"):
+            total_bytes, audio_seconds = preflight(reciter_choice, ayahs)
+        estimate = f"{total_bytes / 1e6:.1f} MB of audio"
+        if audio_seconds:
+            estimate += f", about {audio_seconds / 60:.1f} min"
+        st.info(f"Fetching {len(ayahs)} ayahs: {estimate}")
 
-        # Prepare text images
-        text_clips = prepare_text_images(surah_num, start, end, final_bg.size[0]-100, 250, FONT_PATH)
-        verse_duration = audio_clip.duration / len(text_clips)
-        for i, clip in enumerate(text_clips):
-            clip = clip.set_duration(verse_duration).set_start(i*verse_duration).set_position("center")
-            text_clips[i] = clip
+        # Filter the background loop once; later renders reuse the cached result.
+        # Overlay exports pass no filters and never read the background
+        bg_path = prepare_background(bg_path, readability, report)
+        palette = background_palette(bg_path, report) if adaptive_color else None
 
-        # Combine background + text + audio
-        final_clip = CompositeVideoClip([final_bg]+text_clips).set_audio(audio_clip)
+        audio_path = None
+        rendered = {}           # aspect -> video that intro cards can be joined to
+        if use_library:
+            # Stream-copy cached per-ayah clips, rendering only the missing ones
+            from segments import assemble_video
+            assemble_video(reciter_choice, ayahs, bg_path, output_path, FONT_PATH, progress_bar, report, palette)
+            rendered[None] = output_path
+        else:
+            # Audio track from the per-ayah AAC cache, with exact ayah timings
+            audio_path, timings = build_audio_track(reciter_choice, ayahs, progress_bar=progress_bar, report=report)
+            word_timings = None
+            if karaoke:
+                from karaoke import load_word_timings
+                word_timings = load_word_timings(reciter_choice)
+                if not word_timings:
+                    st.warning(f"No word timings for {reciter_choice}; words will not be highlighted")
+
+            if text_mode == "Overlay only (alpha)":
+                # Verse track with alpha + audio + timing, zipped; no background is read
+                from overlay import export_overlay
+                overlay_dir = os.path.splitext(output_path)[0] + "_overlay"
+                export_overlay(reciter_choice, audio_path, ayahs, timings, overlay_dir, overlay_format,
+                               font_path=FONT_PATH, report=report)
+                output_path = shutil.make_archive(overlay_dir, "zip", overlay_dir)
+            elif split_shorts:
+                # Clips that end on complete ayahs, zipped with their index.json
+                from compositor import render_shorts
+                shorts_dir = os.path.splitext(output_path)[0] + "_shorts"
+                index = render_shorts(reciter_choice, bg_path, ayahs, timings, shorts_dir, short_seconds,
+                                      aspect_choices[0] if aspect_choices else None, FONT_PATH, progress_bar, report,
+                                      visualizer, transition, word_timings, palette)
+                output_path = shutil.make_archive(shorts_dir, "zip", shorts_dir)
+                st.info(f"Split into {len(index['clips'])} clips")
+            elif aspect_choices:
+                # Every chosen aspect ratio from one decode of the background
+                from compositor import render_profiles
+                stem = os.path.splitext(output_path)[0]
+                outputs = {name: f"{stem}_{name.replace(':', 'x')}.mp4" for name in aspect_choices}
+                render_profiles(bg_path, audio_path, ayahs, timings, outputs, FONT_PATH, progress_bar, report,
+                                visualizer, transition, word_timings, palette)
+                output_path = outputs[aspect_choices[0]]
+                rendered = outputs
+            elif visualizer or transition != "none" or word_timings:
+                # Effects are applied in the compositor's numpy blend, at the background's own framing
+                from compositor import render_profiles
+                render_profiles(bg_path, audio_path, ayahs, timings, {"original": output_path}, FONT_PATH,
+                                progress_bar, report, visualizer, transition, word_timings, palette)
+                rendered[None] = output_path
+            elif text_mode == "Burned in":
+                # Background + verse cards + audio
+                final_clip = build_video(bg_path, audio_path, ayahs, FONT_PATH, report, timings, palette)
 
-        # Output file
-        output_path = os.path.join(BASE_DIR, f"surah_{surah_num}_{start}-{end}_{reciter_choice}.mp4")
-        final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", threads=4, preset="ultrafast")
+                # Output file
+                write_video(final_clip, output_path, report=report, audio_track=audio_path)
+                rendered[None] = output_path
+            else:
+                # Verses as a subtitle track over the stream-copied background
+                from subtitles import build_cues, render_with_subtitles
+                render_with_subtitles(bg_path, audio_path, build_cues(ayahs, timings), output_path,
+                                      subtitle_format, text_mode != "Subtitle track", FONT_PATH, report, palette)
+
+        # Title and outro cards come from the intro cache and are joined by stream copy
+        if title_card or bismillah_card or outro_card:
+            from intros import add_intros, intro_cards
+            surah = ayahs[0][0]
+            for aspect, path in rendered.items():
+                add_intros(path, surah, bg_path, intro_cards(surah, title_card, bismillah_card), outro_card,
+                           aspect, FONT_PATH, palette, report)
+        for extra in list(rendered.values())[1:]:
+            with open(extra, "rb") as f:
+                st.download_button(f" Download {os.path.basename(extra)}", f,
+                                   file_name=os.path.basename(extra), key=extra)
+        report.log()
 
         # Enable download button
         with open(output_path, "rb") as f:
@@ -163,8 +259,15 @@ if generate_clicked:
         progress_bar.empty()
         st.success("Video generated successfully!")
 
+        # Render breakdown
+        with st.expander(f"Render breakdown ({report.total_wall()} s)"):
+            st.table(report.spans)
+            st.caption(f"Fetched {report.counters['bytes_fetched'] / 1e6:.1f} MB, "
+                       f"encoded {report.counters['frames_encoded']} frames")
+
         # Cleanup temp audio
-        os.unlink(audio_path)
+        if audio_path:
+            os.unlink(audio_path)
 
     except Exception as e:
         st.error(f"Error: {e}")
@@ -7,6 +7,7 @@ from moviepy.video.VideoClip import TextClip
 from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
 from moviepy.editor import concatenate_videoclips
 from moviepy.config import change_settings
+from boundaries import verse_boundaries
 
 import arabic_reshaper
 from bidi.algorithm import get_display
@@ -92,13 +93,13 @@ if generate:
             st.error(" Recitation audio not found")
             st.stop()
 
-        audio_clip = AudioFileClip(os.path.join(recitation_folder, audio_file))
+        audio_path = os.path.join(recitation_folder, audio_file)
+        audio_clip = AudioFileClip(audio_path)
 
-        # Approximate clipping by verse count
-        verse_duration = audio_clip.duration / total_verses
-        start_time = (start - 1) * verse_duration
-        end_time = end * verse_duration
-        audio_clip = audio_clip.subclip(start_time, end_time)
+        # Cut at detected verse boundaries (cached next to the MP3)
+        bounds = verse_boundaries(audio_path, [v["text"] for v in surah])
+        start_time, end_time = bounds[start - 1], bounds[end]
+        audio_clip = audio_clip.subclip(start_time, min(end_time, audio_clip.duration))
 
         # Background looping
         bg_clip = VideoFileClip(bg_path)
@@ -107,8 +108,9 @@ if generate:
 
         # Verse overlays
         text_clips = []
-        verse_dur = audio_clip.duration / len(verses)
         for i, v in enumerate(verses):
+            verse_start = bounds[start - 1 + i] - start_time
+            verse_dur = bounds[start + i] - bounds[start - 1 + i]
             full_text = f"{v['arabic']}\n{v['translation']}"
             txt = TextClip(
                 full_text,
@@ -119,7 +121,7 @@ if generate:
                 size=(bg_clip.size[0], 150),
                 bg_color="black"
             )
-            txt = txt.set_position("center").set_start(i * verse_dur).set_duration(verse_dur)
+            txt = txt.set_position("center").set_start(verse_start).set_duration(verse_dur)
             text_clips.append(txt)
 
         final_clip = CompositeVideoClip([bg_final] + text_clips).set_audio(audio_clip)
@@ -9,6 +9,7 @@ from moviepy.video.VideoClip import TextClip
 from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
 from moviepy.editor import concatenate_videoclips
 from moviepy.config import change_settings
+from boundaries import verse_boundaries
 
 # ---------------- SETTINGS ----------------
 # Fix ImageMagick path (Windows)
@@ -125,11 +126,10 @@ if st.button("🚀 Generate Video"):
 
         audio_clip = AudioFileClip(audio_path)
 
-        # Clip audio to selected verses (approximation)
-        verse_duration = audio_clip.duration / total_verses
-        start_time = (start-1) * verse_duration
-        end_time = end * verse_duration
-        audio_clip = audio_clip.subclip(start_time, end_time)
+        # Clip audio at detected verse boundaries (cached next to the MP3)
+        bounds = verse_boundaries(audio_path, [a["text"] for a in arabic_verses])
+        start_time, end_time = bounds[start-1], bounds[end]
+        audio_clip = audio_clip.subclip(start_time, min(end_time, audio_clip.duration))
 
         # Background
         bg_clip = VideoFileClip(bg_path)
@@ -138,9 +138,9 @@ if st.button("🚀 Generate Video"):
 
         # Text overlays
         text_clips = []
-        verse_clip_duration = audio_clip.duration / len(verses)
-
         for i, verse in enumerate(verses):
+            verse_clip_start = bounds[start-1+i] - start_time
+            verse_clip_duration = bounds[start+i] - bounds[start-1+i]
             txt = f"{verse['arabic']}\n{verse['translation']}"
             txt_clip = TextClip(
                 txt,
@@ -150,7 +150,7 @@ if st.button("🚀 Generate Video"):
                 method="caption",
                 size=(bg_clip.size[0]-100, 200),
                 bg_color="black"
-            ).set_position("center").set_duration(verse_clip_duration).set_start(i*verse_clip_duration)
+            ).set_position("center").set_duration(verse_clip_duration).set_start(verse_clip_start)
             text_clips.append(txt_clip)
 
         # Combine
@@ -0,0 +1,97 @@
+import os
+import json
+import tempfile
+import threading
+import subprocess
+import numpy as np
+from timing import span, count
+from catalog import DATA_DIR
+from prefetch import PREFETCHER
+from ffmpeg_tools import ffmpeg_binary, run_ffmpeg, concat_copy
+
+# Per-ayah AAC cache. Each ayah is transcoded once per reciter, padded with
+# silence to a whole number of AAC frames, and its sample count is kept in
+# a sidecar. A selection's audio track is then a stream-copy concatenation
+# that drops each file's priming frame, so renders never re-encode audio
+# and the joins are gapless.
+
+# ---------------- SETTINGS ----------------
+AAC_CACHE_DIR = os.path.join(DATA_DIR, "cache", "aac")
+AAC_RATE = 44100
+AAC_CHANNELS = 2
+AAC_BITRATE = "192k"
+FRAME_SAMPLES = 1024        # AAC-LC samples per frame; also ffmpeg's encoder delay
+SIDECAR_VERSION = 1
+
+
+# ---------------- HELPERS ----------------
+def aac_path(reciter, surah, verse):
+    return os.path.join(AAC_CACHE_DIR, reciter, f"{surah:03d}{verse:03d}.m4a")
+
+def sidecar_path(path):
+    return path + ".json"
+
+def source_key(mp3_path):
+    stat = os.stat(mp3_path)
+    return {"version": SIDECAR_VERSION, "size": stat.st_size, "mtime": int(stat.st_mtime),
+            "rate": AAC_RATE, "bitrate": AAC_BITRATE}
+
+
+# ---------------- CACHE ----------------
+def transcode_ayah(reciter, surah, verse, report=None):
+    """Cached AAC of one ayah; returns (path, samples) where samples excludes priming"""
+    mp3, fetched = PREFETCHER.fetch(reciter, surah, verse)
+    count(report, "bytes_fetched", fetched)
+    path = aac_path(reciter, surah, verse)
+    key = source_key(mp3)
+    if os.path.exists(path) and os.path.exists(sidecar_path(path)):
+        with open(sidecar_path(path), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("key") == key:
+            return path, info["samples"]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ffmpeg = ffmpeg_binary()
+    pcm = subprocess.run([ffmpeg, "-v", "error", "-i", mp3, "-f", "s16le", "-ac", str(AAC_CHANNELS),
+                          "-ar", str(AAC_RATE), "-"], capture_output=True, check=True).stdout
+    samples = np.frombuffer(pcm, dtype=np.int16).reshape(-1, AAC_CHANNELS)
+    # Whole frames only, so the stream-copied joins land exactly on frame edges
+    padded = -(-len(samples) // FRAME_SAMPLES) * FRAME_SAMPLES
+    pcm += bytes((padded - len(samples)) * AAC_CHANNELS * 2)
+
+    tmp = f"{path}.{threading.get_ident()}.tmp.m4a"
+    run_ffmpeg("-f", "s16le", "-ac", str(AAC_CHANNELS), "-ar", str(AAC_RATE), "-i", "-",
+               "-c:a", "aac", "-b:a", AAC_BITRATE, tmp, input=pcm)
+    os.replace(tmp, path)
+    with open(sidecar_path(path), "w", encoding="utf-8") as f:
+        json.dump({"key": key, "samples": padded, "source_samples": len(samples),
+                   "priming": FRAME_SAMPLES}, f)
+    return path, padded
+
+
+# ---------------- TRACKS ----------------
+def build_audio_track(reciter, ayahs, output_path=None, progress_bar=None, report=None):
+    """Concatenate cached per-ayah AAC by stream copy.
+
+    Returns (track_path, timings) with exact (start, end) seconds per ayah
+    in the track. output_path defaults to a temp .m4a the caller removes.
+    """
+    entries, timings, t = [], [], 0
+    with span(report, "transcode_audio"):
+        for i, (surah, verse) in enumerate(ayahs):
+            path, samples = transcode_ayah(reciter, surah, verse, report)
+            entries.append((path, samples))
+            timings.append((t / AAC_RATE, (t + samples) / AAC_RATE))
+            t += samples
+            if progress_bar:
+                progress_bar.progress((i+1)/len(ayahs))
+
+    if output_path is None:
+        handle, output_path = tempfile.mkstemp(suffix=".m4a")
+        os.close(handle)
+    # Timestamps start at -FRAME_SAMPLES, so inpoint 0 drops exactly the priming
+    # frame; the explicit duration keeps every join on the sample grid
+    with span(report, "concat_audio"):
+        concat_copy([(path, [("inpoint", 0), ("duration", f"{samples / AAC_RATE:.9f}")])
+                     for path, samples in entries], output_path)
+    return output_path, timings
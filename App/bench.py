@@ -0,0 +1,196 @@
+"""Benchmarks for the Quran video pipeline.
+
+Everything runs offline: backgrounds are generated with ffmpeg testsrc and
+the per-ayah MP3s are generated tones served from a local HTTP server.
+Run from the App folder:
+
+    python bench.py                         # all benchmarks
+    python bench.py shaping
+    python bench.py pipeline --sizes 1 7 --output bench.json
+
+Compare the JSON written by --output between commits to spot regressions.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import layout
+import catalog
+import prefetch
+from ffmpeg_tools import run_ffmpeg
+
+# ---------------- SETTINGS ----------------
+# surah size -> (surah, start, end) of a real selection with that many ayahs
+SURAH_SIZES = {
+    1: (1, 1, 1),
+    7: (1, 1, 7),
+    286: (2, 1, 286),
+}
+BENCH_RECITER = "Bench"
+BG_SIZE = (640, 360)
+BG_SECONDS = 2
+COMPOSITE_FRAMES = 120
+
+
+# ---------------- HELPERS ----------------
+def load_arabic_verses():
+    return [v["text"] for surah in catalog.ARABIC_QURAN.values() for v in surah]
+
+def shape_and_measure(text, engine, size=50):
+    """Shape one verse and measure it, bypassing the layout caches"""
+    font = layout.load_font(catalog.FONT_PATH, size, engine)
+    options = layout.text_options(engine, True)
+    if engine == "basic":
+        text = layout.get_display(layout.arabic_reshaper.reshape(text))
+    return font.getlength(text, **options)
+
+def make_fixtures(fixture_dir, max_ayahs, ayah_seconds):
+    """Generate a testsrc background and one tone MP3 per benchmarked ayah"""
+    bg_path = os.path.join(fixture_dir, "testsrc.mp4")
+    run_ffmpeg("-f", "lavfi", "-i", f"testsrc=size={BG_SIZE[0]}x{BG_SIZE[1]}:rate=24:duration={BG_SECONDS}",
+               "-pix_fmt", "yuv420p", bg_path)
+
+    audio_dir = os.path.join(fixture_dir, "audio")
+    os.makedirs(audio_dir, exist_ok=True)
+    tone = os.path.join(fixture_dir, "tone.mp3")
+    run_ffmpeg("-f", "lavfi", "-i", f"sine=frequency=440:duration={ayah_seconds}",
+               "-ar", "44100", "-ac", "2", "-b:a", "128k", tone)
+    for surah, start, end in SURAH_SIZES.values():
+        for verse in range(start, min(end, start + max_ayahs - 1) + 1):
+            shutil.copyfile(tone, os.path.join(audio_dir, f"{surah:03d}{verse:03d}.mp3"))
+    return bg_path, audio_dir
+
+def serve_directory(path):
+    """Serve path over HTTP on a free local port; returns (server, base_url)"""
+    handler = functools.partial(QuietHandler, directory=path)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - t0, 4)
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=catalog.BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------- BENCHMARKS ----------------
+def bench_shaping(engines=("basic", "raqm")):
+    """Shaping throughput over every verse for each available engine"""
+    verses = load_arabic_verses()
+    results = {}
+    for engine in engines:
+        if engine == "raqm" and not layout.RAQM_AVAILABLE:
+            results[engine] = {"skipped": "Pillow built without libraqm"}
+            continue
+        t0 = time.perf_counter()
+        for text in verses:
+            shape_and_measure(text, engine)
+        elapsed = time.perf_counter() - t0
+        results[engine] = {
+            "verses": len(verses),
+            "seconds": round(elapsed, 4),
+            "verses_per_second": round(len(verses) / elapsed, 1),
+        }
+    return results
+
+def bench_pipeline_size(pipeline, bg_path, size):
+    """Time every stage of one render of a `size`-ayah selection"""
+    surah, start, end = SURAH_SIZES[size]
+    result = {"surah": surah, "start": start, "end": end}
+
+    _, result["corpus_load_s"] = timed(catalog.load_corpus)
+
+    # Measure real fetches, not audio cache hits
+    shutil.rmtree(os.path.join(prefetch.AUDIO_CACHE_DIR, BENCH_RECITER), ignore_errors=True)
+
+    ayahs = [(surah, v) for v in range(start, end + 1)]
+    texts = [catalog.verse_texts(s, v)[0] for s, v in ayahs]
+    audio_path, result["audio_fetch_s"] = timed(pipeline.download_audio, BENCH_RECITER, ayahs)
+
+    _, result["shaping_s"] = timed(lambda: [shape_and_measure(t, layout.SHAPING_ENGINE) for t in texts])
+
+    # Rasterize from scratch at every size, not from the previous size's cards
+    pipeline.clear_card_cache()
+    card_w = BG_SIZE[0] - 100
+    _, result["rasterize_s"] = timed(pipeline.prepare_text_images, ayahs, card_w, 250, catalog.FONT_PATH)
+
+    final_clip, result["build_s"] = timed(pipeline.build_video, bg_path, audio_path, ayahs)
+    frames = min(COMPOSITE_FRAMES, int(final_clip.duration * 24))
+    t0 = time.perf_counter()
+    for i in range(frames):
+        final_clip.get_frame(i / 24)
+    result["composite_fps"] = round(frames / (time.perf_counter() - t0), 1)
+
+    out_path = os.path.join(os.path.dirname(bg_path), f"bench_{size}.mp4")
+    _, result["encode_s"] = timed(pipeline.write_video, final_clip, out_path, logger=None)
+    result["video_seconds"] = round(final_clip.duration, 2)
+    final_clip.close()
+    os.unlink(audio_path)
+    return result
+
+def bench_pipeline(sizes=(1, 7, 286), ayah_seconds=0.5):
+    """Full render pipeline at fixed selection sizes against offline fixtures"""
+    import pipeline
+    results = {}
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        bg_path, audio_dir = make_fixtures(fixture_dir, max(sizes), ayah_seconds)
+        server, base_url = serve_directory(audio_dir)
+        catalog.RECITER_URLS[BENCH_RECITER] = base_url
+        try:
+            for size in sizes:
+                results[str(size)] = bench_pipeline_size(pipeline, bg_path, size)
+        finally:
+            server.shutdown()
+            shutil.rmtree(os.path.join(prefetch.AUDIO_CACHE_DIR, BENCH_RECITER), ignore_errors=True)
+            del catalog.RECITER_URLS[BENCH_RECITER]
+    return results
+
+
+BENCHMARKS = ["shaping", "pipeline"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quran video pipeline benchmarks")
+    parser.add_argument("benchmarks", nargs="*", help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=sorted(SURAH_SIZES),
+                        choices=sorted(SURAH_SIZES), help="selection sizes in ayahs")
+    parser.add_argument("--ayah-seconds", type=float, default=0.5, help="length of each generated ayah MP3")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    report = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    for name in args.benchmarks or BENCHMARKS:
+        if name == "shaping":
+            report[name] = bench_shaping()
+        else:
+            report[name] = bench_pipeline(args.sizes, args.ayah_seconds)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+import os
+import json
+import subprocess
+import numpy as np
+from ffmpeg_tools import ffmpeg_binary
+
+# Verse boundaries for full-surah recitation files. The MP3 is decoded once
+# to mono PCM, pauses are found from frame energy, and the pauses are
+# matched to the surah's ayah count. The result is cached in a sidecar
+# "<file>.boundaries.json" so later cuts are a lookup.
+
+# ---------------- SETTINGS ----------------
+SAMPLE_RATE = 8000
+FRAME_SECONDS = 0.02
+MIN_PAUSE = 0.25            # shortest silence treated as a pause, seconds
+SILENCE_MARGIN_DB = 10      # pause = quieter than the noise floor + margin
+DRIFT_WEIGHT = 0.05         # pause seconds traded per second of drift
+GUESS_PENALTY = 1.0         # cost of using a text-length guess over a real pause
+SIDECAR_VERSION = 1
+
+
+# ---------------- DECODING ----------------
+def decode_pcm(audio_path, sample_rate=SAMPLE_RATE):
+    """Decode any audio file to mono float32 samples in [-1, 1]"""
+    cmd = [ffmpeg_binary(), "-v", "error", "-i", audio_path,
+           "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+# ---------------- ANALYSIS ----------------
+def frame_energy_db(samples, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """RMS energy per frame in dB"""
+    frame = int(sample_rate * frame_seconds)
+    n = len(samples) // frame
+    frames = samples[:n * frame].reshape(n, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-9)
+
+def find_pauses(energy_db, frame_seconds=FRAME_SECONDS, min_pause=MIN_PAUSE):
+    """Return (centers, lengths) in seconds of every silent run"""
+    floor = np.percentile(energy_db, 10)
+    silent = energy_db < floor + SILENCE_MARGIN_DB
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    lengths = (ends - starts) * frame_seconds
+    keep = lengths >= min_pause
+    centers = (starts[keep] + ends[keep]) / 2 * frame_seconds
+    return centers, lengths[keep]
+
+def expected_boundaries(verse_texts, speech_start, speech_end):
+    """Boundary guesses assuming recitation time is proportional to text length"""
+    weights = np.array([len(t) for t in verse_texts], dtype=np.float64)
+    cumulative = np.cumsum(weights)[:-1] / weights.sum()
+    return speech_start + cumulative * (speech_end - speech_start)
+
+def snap_to_verses(centers, lengths, expected):
+    """Choose one pause per expected boundary, in order.
+
+    Dynamic programming over an increasing assignment of pauses that
+    maximises pause length minus drift from the text-proportional guess.
+    The guesses are added as penalised candidates so every boundary still
+    has somewhere to land when the recitation has too few clear pauses.
+    """
+    k = len(expected)
+    if k == 0:
+        return np.array([])
+    times = np.concatenate((centers, expected))
+    gains = np.concatenate((lengths, np.full(k, -GUESS_PENALTY)))
+    order = np.argsort(times, kind="stable")
+    times, gains = times[order], gains[order]
+    m = len(times)
+
+    score = gains[None, :] - DRIFT_WEIGHT * np.abs(times[None, :] - expected[:, None])
+    best = np.full((k, m), -np.inf)
+    back = np.zeros((k, m), dtype=np.int64)
+    best[0] = score[0]
+    for i in range(1, k):
+        # best previous boundary at any candidate strictly before this one
+        running = np.maximum.accumulate(best[i - 1])
+        running_arg = np.maximum.accumulate(np.where(best[i - 1] == running, np.arange(m), 0))
+        best[i, 1:] = score[i, 1:] + running[:-1]
+        back[i, 1:] = running_arg[:-1]
+
+    chosen = np.zeros(k, dtype=np.int64)
+    chosen[-1] = int(np.argmax(best[-1]))
+    for i in range(k - 1, 0, -1):
+        chosen[i - 1] = back[i][chosen[i]]
+    return times[chosen]
+
+def detect_boundaries(audio_path, verse_texts):
+    """Start time of every verse plus the end of the last one, in seconds"""
+    samples = decode_pcm(audio_path)
+    energy = frame_energy_db(samples)
+    duration = len(samples) / SAMPLE_RATE
+
+    voiced = np.flatnonzero(energy >= np.percentile(energy, 10) + SILENCE_MARGIN_DB)
+    speech_start = voiced[0] * FRAME_SECONDS if len(voiced) else 0.0
+    speech_end = (voiced[-1] + 1) * FRAME_SECONDS if len(voiced) else duration
+
+    centers, lengths = find_pauses(energy)
+    inside = (centers > speech_start) & (centers < speech_end)
+    expected = expected_boundaries(verse_texts, speech_start, speech_end)
+    cuts = snap_to_verses(centers[inside], lengths[inside], expected)
+    return [0.0] + [round(float(t), 3) for t in cuts] + [round(duration, 3)]
+
+
+# ---------------- SIDECAR CACHE ----------------
+def sidecar_path(audio_path):
+    return audio_path + ".boundaries.json"
+
+def verse_boundaries(audio_path, verse_texts):
+    """Cached detect_boundaries; recomputed when the audio file changes"""
+    stat = os.stat(audio_path)
+    key = {"version": SIDECAR_VERSION, "size": stat.st_size, "mtime": int(stat.st_mtime),
+           "verses": len(verse_texts)}
+    path = sidecar_path(audio_path)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["boundaries"]
+
+    boundaries = detect_boundaries(audio_path, verse_texts)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "boundaries": boundaries}, f)
+    return boundaries
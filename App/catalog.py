@@ -0,0 +1,108 @@
+import os
+import re
+import json
+
+# Paths, corpus and reciter tables shared by the UI and the render pipeline.
+# Keep this module free of heavy imports: App.py imports it on every run,
+# before the sidebar is drawn.
+
+# ---------------- PROJECT SETUP ----------------
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_DIR = os.path.join(BASE_DIR, "Data")
+BACKGROUNDS_DIR = os.path.join(DATA_DIR, "Backgrounds")
+FONTS_DIR = os.path.join(DATA_DIR, "font")
+MIRROR_DIR = os.path.join(DATA_DIR, "mirror")
+
+font_files = [f for f in os.listdir(FONTS_DIR) if f.lower().endswith(".ttf")]
+if not font_files:
+    raise FileNotFoundError("No TTF font found in Data/fonts/")
+FONT_PATH = os.path.join(FONTS_DIR, font_files[0])
+
+
+# ---------------- LOAD QURAN DATA ----------------
+def load_corpus():
+    with open(os.path.join(DATA_DIR, "quran_ar.json"), "r", encoding="utf-8") as f:
+        arabic = json.load(f)
+    with open(os.path.join(DATA_DIR, "quran_en.json"), "r", encoding="utf-8") as f:
+        english = json.load(f)
+    with open(os.path.join(DATA_DIR, "surahs.txt"), "r", encoding="utf-8") as f:
+        surahs = [line.strip() for line in f if line.strip()]
+    return arabic, english, surahs
+
+ARABIC_QURAN, ENGLISH_QURAN, SURAH_LIST = load_corpus()
+
+with open(os.path.join(DATA_DIR, "chapters.json"), "r", encoding="utf-8") as f:
+    CHAPTERS = {c["id"]: c for c in json.load(f)}
+
+# ---------------- RECITERS ----------------
+RECITER_URLS = {
+    "Sudais": "https://archive.org/download/quran-sudais-193/quran-sudais/",
+    "Shuraim": "https://archive.org/download/quran-shuraim-192/quran-shuraim-192/",
+    "Alafasy": "https://archive.org/download/quran-alafasy-192/quran-alafasy-192/",
+    "Yasir": "https://archive.org/download/quran-yasir-192/quran-yasir-192/",
+}
+
+# ---------------- HELPER FUNCTIONS ----------------
+def mirror_audio_path(reciter, surah, verse):
+    return os.path.join(MIRROR_DIR, reciter, f"{surah:03d}{verse:03d}.mp3")
+
+def get_audio_url(reciter, surah, verse, remote=False):
+    """URL of an ayah MP3, or its local path once mirrored (see mirror.py)"""
+    local = mirror_audio_path(reciter, surah, verse)
+    if not remote and os.path.isfile(local):
+        return local
+    return f"{RECITER_URLS[reciter]}{surah:03d}{verse:03d}.mp3"
+
+def verse_texts(surah, verse):
+    return ARABIC_QURAN[str(surah)][verse-1]["text"], ENGLISH_QURAN[str(surah)][verse-1]["text"]
+
+SELECTION_ITEM = re.compile(r"^(?:(\d+)\s*:\s*)?(\d+)(?:\s*-\s*(\d+))?$")
+
+def parse_selection(text, default_surah):
+    """Parse "2:255, 3:190-194, 5-7" into an ordered list of (surah, ayah).
+
+    Items without a surah refer to default_surah, and an empty selection
+    is the whole of default_surah. Reversed ranges are swapped. Raises
+    ValueError for anything chapters.json says does not exist.
+    """
+    if not text.strip():
+        total = CHAPTERS[default_surah]["total_verses"]
+        return [(default_surah, v) for v in range(1, total + 1)]
+
+    ayahs = []
+    for item in text.split(","):
+        item = item.strip()
+        match = SELECTION_ITEM.match(item)
+        if not match:
+            raise ValueError(f"Cannot read {item!r}; use e.g. 2:255 or 3:190-194")
+        surah = int(match.group(1)) if match.group(1) else default_surah
+        start = int(match.group(2))
+        end = int(match.group(3)) if match.group(3) else start
+        if start > end:
+            start, end = end, start
+        if surah not in CHAPTERS:
+            raise ValueError(f"There is no surah {surah}")
+        total = CHAPTERS[surah]["total_verses"]
+        if start < 1 or end > total:
+            raise ValueError(f"Surah {surah} has {total} ayahs; {item!r} is out of range")
+        ayahs.extend((surah, v) for v in range(start, end + 1))
+    return ayahs
+
+def selection_ranges(ayahs):
+    """Collapse consecutive (surah, ayah) pairs into (surah, start, end) runs"""
+    ranges = []
+    for surah, verse in ayahs:
+        if ranges and ranges[-1][0] == surah and ranges[-1][2] == verse - 1:
+            ranges[-1][2] = verse
+        else:
+            ranges.append([surah, verse, verse])
+    return [tuple(r) for r in ranges]
+
+def selection_label(ayahs):
+    """Short file-name friendly label, e.g. 2_255+3_190-194"""
+    parts = []
+    for surah, start, end in selection_ranges(ayahs):
+        parts.append(f"{surah}_{start}" if start == end else f"{surah}_{start}-{end}")
+    return "+".join(parts)
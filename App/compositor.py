@@ -0,0 +1,318 @@
+import os
+import json
+import tempfile
+import numpy as np
+from moviepy.editor import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from timing import span, count
+from ffmpeg_tools import run_ffmpeg
+from catalog import FONT_PATH
+from layout import word_boxes, layout_verse_card, DEFAULT_PALETTE
+from pipeline import CARD_MARGIN, CARD_HEIGHT, verse_texts, card_array, card_fill_mask, is_aac
+from audio_track import build_audio_track
+from visualizer import band_levels, bar_strip, draw_bars
+from transitions import transition_table, word_reveal_table, SLIDE_DISTANCE
+from karaoke import word_table, HIGHLIGHT_COLOR
+
+# Several aspect ratios from one pass: every background frame is decoded
+# once, center-cropped per profile and blended with that profile's verse
+# cards in numpy, then fed to one ffmpeg writer per output. The AAC audio
+# is stream-copied into every output. The optional visualizer's levels, the
+# card transitions and the karaoke word timings are computed once per
+# track, so each frame only reads precomputed values.
+
+# ---------------- SETTINGS ----------------
+OUTPUT_PROFILES = {
+    "16:9": (16, 9),    # YouTube
+    "9:16": (9, 16),    # Shorts / Reels
+    "1:1": (1, 1),      # feed
+}
+AUDIO_BITRATE = "192k"
+SHORT_MAX_SECONDS = 60
+
+
+# ---------------- LAYOUT ----------------
+def crop_box(size, aspect=None):
+    """Largest centered (x, y, w, h) of the given aspect inside size, even-sized for yuv420p"""
+    width, height = size
+    if aspect is None:
+        return 0, 0, width // 2 * 2, height // 2 * 2
+    w = min(width, height * aspect[0] // aspect[1]) // 2 * 2
+    h = min(height, w * aspect[1] // aspect[0]) // 2 * 2
+    return (width - w) // 2, (height - h) // 2, w, h
+
+def card_layer(arabic, english, frame_w, frame_h, font_path=FONT_PATH, palette=None):
+    """(rgb, alpha, fill, x, y) of a centered card, cropped to the frame if it grows taller.
+
+    fill is the alpha of the Arabic glyphs without their outline, for
+    highlight; it is alpha itself when the palette has no outline.
+    """
+    card_w = frame_w - min(CARD_MARGIN, frame_w // 10)
+    card = card_array(arabic, english, card_w, CARD_HEIGHT, font_path, palette)
+    rgb, alpha = card[:, :, :3], card[:, :, 3]
+    outlined = (palette or DEFAULT_PALETTE)[2] > 0
+    fill = card_fill_mask(arabic, english, card_w, CARD_HEIGHT, font_path) if outlined else None
+    h = rgb.shape[0]
+    if h > frame_h:
+        top = (h - frame_h) // 2
+        rgb, alpha, h = rgb[top:top + frame_h], alpha[top:top + frame_h], frame_h
+        if outlined:
+            fill = fill[top:top + frame_h]
+    alpha = alpha[:, :, None] / np.float32(255)
+    fill = fill[:, :, None] / np.float32(255) if outlined else alpha
+    return rgb, alpha, fill, (frame_w - card_w) // 2, (frame_h - h) // 2
+
+def blend(frame, layer, opacity=1.0, dy=0, reveal=1.0, hidden=()):
+    """Alpha-blend a card layer onto frame in place.
+
+    opacity fades the card, dy shifts it down and reveal uncovers it from
+    the right, the way the verse text reads; hidden areas (from
+    word_reveal_steps) are left out. The defaults cost nothing.
+    """
+    rgb, alpha, _, x, y = layer
+    if opacity <= 0 or reveal <= 0:
+        return frame
+    if hidden:
+        alpha = alpha.copy()
+        for x0, y0, x1, y1 in hidden:
+            alpha[y0:y1, x0:x1] = 0
+    h, w = alpha.shape[:2]
+    y += dy
+    top, bottom = max(0, -y), min(h, frame.shape[0] - y)
+    left = w - int(round(w * reveal)) if reveal < 1 else 0
+    if top or bottom < h or left:
+        rgb, alpha = rgb[top:bottom, left:], alpha[top:bottom, left:]
+    if opacity < 1:
+        alpha = alpha * opacity
+    region = frame[y + top:y + bottom, x + left:x + w]
+    region[:] = region + (rgb - region.astype(np.float32)) * alpha
+    return frame
+
+def layer_boxes(arabic, english, frame_w, frame_h, font_path=FONT_PATH):
+    """Arabic word boxes in the coordinates of card_layer's (possibly cropped) card"""
+    card_w = frame_w - min(CARD_MARGIN, frame_w // 10)
+    h = layout_verse_card(arabic, english, font_path, card_w, CARD_HEIGHT)[0]
+    top = (h - frame_h) // 2 if h > frame_h else 0
+    return [(x0, max(0, y0 - top), x1, min(h - top, frame_h, y1 - top))
+            for x0, y0, x1, y1 in word_boxes(arabic, english, font_path, card_w, CARD_HEIGHT)]
+
+def highlight(frame, layer, box, opacity=1.0, dy=0, color=HIGHLIGHT_COLOR):
+    """Recolor the fill of one word of an already blended card in place, leaving its outline"""
+    _, _, fill, x, y = layer
+    x0, y0, x1, y1 = box
+    y += dy
+    y0, y1 = max(y0, -y), min(y1, frame.shape[0] - y)
+    if y1 <= y0:
+        return frame
+    region = frame[y + y0:y + y1, x + x0:x + x1]
+    mask = fill[y0:y1, x0:x1]
+    region[:] = region + (np.array(color, dtype=np.float32) - region) * (mask * opacity if opacity < 1 else mask)
+    return frame
+
+def word_reveal_steps(boxes):
+    """Card areas still hidden with the first k words uncovered, for every k.
+
+    Hidden words are the last ones of their lines, so each line's hidden
+    part is one span from the card's left edge to its first shown word,
+    taking in the spaces and glyph overhangs between the words.
+    """
+    steps = []
+    for k in range(len(boxes) + 1):
+        rows = {}
+        for i, (x0, y0, x1, y1) in enumerate(boxes):
+            row = rows.setdefault((y0, y1), [False, None])
+            if i >= k:
+                row[0] = True
+            else:
+                row[1] = x0 if row[1] is None else min(row[1], x0)
+        steps.append([(0, y0, right, y1) for (y0, y1), (hidden, right) in rows.items() if hidden])
+    return steps
+
+def prepare_layers(ayahs, frame_w, frame_h, font_path=FONT_PATH, palette=None):
+    """One card layer per ayah; repeated verses share one layer"""
+    interned, layers = {}, []
+    for surah, verse in ayahs:
+        texts = verse_texts(surah, verse)
+        if texts not in interned:
+            interned[texts] = card_layer(*texts, frame_w, frame_h, font_path, palette)
+        layers.append(interned[texts])
+    return layers
+
+def prepare_boxes(ayahs, frame_w, frame_h, font_path=FONT_PATH):
+    """Word boxes per ayah, matching prepare_layers"""
+    return [layer_boxes(*verse_texts(surah, verse), frame_w, frame_h, font_path) for surah, verse in ayahs]
+
+
+# ---------------- RENDER ----------------
+def encode_audio(audio_path, output_path):
+    run_ffmpeg("-i", audio_path, "-vn", "-c:a", "aac", "-b:a", AUDIO_BITRATE, output_path)
+    return output_path
+
+def open_writer(path, size, fps, audio_file):
+    return FFMPEG_VideoWriter(path, size, fps, codec="libx264", audiofile=audio_file,
+                              preset="ultrafast", threads=4)
+
+def render_profiles(bg_path, audio_path, ayahs, timings, outputs, font_path=FONT_PATH,
+                    progress_bar=None, report=None, visualizer=False, transition="none", word_timings=None,
+                    palette=None):
+    """Render one video per {profile name: output path} in a single pass.
+
+    Profiles are keys of OUTPUT_PROFILES; each output is the largest
+    centered crop of the background at that aspect ratio with its own
+    card layout. Any other name keeps the background's own framing.
+    transition is one of transitions.TRANSITIONS; word_timings, from
+    karaoke.load_word_timings, highlights each word as it is recited.
+    """
+    bg_clip = VideoFileClip(bg_path, audio=False)
+    fps = bg_clip.fps
+    duration = ffmpeg_parse_infos(audio_path)["duration"]
+    n_frames = int(duration * fps)
+    verses, opacity, shift, reveal = transition_table(transition, timings, fps, n_frames)
+    words = word_table(ayahs, timings, word_timings or {}, verses, fps)
+
+    with span(report, "prepare_text_images"):
+        profiles = []
+        for name, path in outputs.items():
+            x, y, w, h = crop_box(bg_clip.size, OUTPUT_PROFILES.get(name))
+            profiles.append(((x, y, w, h), prepare_layers(ayahs, w, h, font_path, palette), path))
+        boxes = [prepare_boxes(ayahs, w, h, font_path) for (x, y, w, h), _, _ in profiles]
+    # Word counts are the same in every profile; only the line breaks differ
+    shown = word_reveal_table(transition, timings, verses, [len(b) for b in boxes[0]], fps)
+    if shown is not None:
+        steps = [[word_reveal_steps(b) for b in profile_boxes] for profile_boxes in boxes]
+    if visualizer:
+        with span(report, "visualizer_levels"):
+            levels = band_levels(audio_path, fps)
+        strips = [bar_strip(w, h) for (x, y, w, h), _, _ in profiles]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if is_aac(audio_path):
+            audio_file = audio_path
+        else:
+            with span(report, "encode_audio"):
+                audio_file = encode_audio(audio_path, os.path.join(tmp, "audio.m4a"))
+
+        writers = [open_writer(path, (w, h), fps, audio_file) for (x, y, w, h), _, path in profiles]
+        try:
+            with span(report, "write_videofile"):
+                for i in range(n_frames):
+                    frame = bg_clip.get_frame(i / fps % bg_clip.duration)
+                    for n, (writer, ((x, y, w, h), layers, _)) in enumerate(zip(writers, profiles)):
+                        dy = int(shift[i] * SLIDE_DISTANCE * h)
+                        verse_boxes = boxes[n][verses[i]]
+                        visible = len(verse_boxes) if shown is None else shown[i]
+                        hidden = steps[n][verses[i]][visible] if shown is not None else ()
+                        out = blend(frame[y:y + h, x:x + w].copy(), layers[verses[i]], opacity[i], dy, reveal[i],
+                                    hidden)
+                        if 0 <= words[i] < visible and reveal[i] >= 1:
+                            highlight(out, layers[verses[i]], verse_boxes[words[i]], opacity[i], dy)
+                        if visualizer and i < len(levels):
+                            draw_bars(out, levels[i], strips[n])
+                        writer.write_frame(out)
+                    if progress_bar and i % 10 == 0:
+                        progress_bar.progress((i + 1) / n_frames)
+        finally:
+            for writer in writers:
+                writer.close()
+            bg_clip.close()
+    count(report, "frames_encoded", n_frames * len(profiles))
+    return list(outputs.values())
+
+
+# ---------------- SHORTS ----------------
+def pack_clips(timings, max_seconds=SHORT_MAX_SECONDS):
+    """Group consecutive ayah indices into clips of at most max_seconds.
+
+    Clips always end on a complete ayah; an ayah longer than the limit
+    becomes a clip on its own.
+    """
+    clips = []
+    for i, (start, end) in enumerate(timings):
+        if clips and end - timings[clips[-1][0]][0] <= max_seconds:
+            clips[-1].append(i)
+        else:
+            clips.append([i])
+    return clips
+
+def render_shorts(reciter, bg_path, ayahs, timings, output_dir, max_seconds=SHORT_MAX_SECONDS,
+                  aspect="9:16", font_path=FONT_PATH, progress_bar=None, report=None, visualizer=False,
+                  transition="none", word_timings=None, palette=None):
+    """Split a selection into clips of at most max_seconds at ayah boundaries.
+
+    All clips come from one forward pass over the background with shared
+    verse cards, and audio stream-copied from the per-ayah AAC cache.
+    Writes clip_NN.mp4 files and index.json into output_dir and returns
+    the index.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    bg_clip = VideoFileClip(bg_path, audio=False)
+    fps = bg_clip.fps
+    x, y, w, h = crop_box(bg_clip.size, OUTPUT_PROFILES.get(aspect))
+    with span(report, "prepare_text_images"):
+        layers = prepare_layers(ayahs, w, h, font_path, palette)
+        boxes = prepare_boxes(ayahs, w, h, font_path)
+    strip = bar_strip(w, h)
+    steps = None
+
+    groups = pack_clips(timings, max_seconds)
+    index = {"reciter": reciter, "aspect": aspect or "original", "max_seconds": max_seconds, "clips": []}
+    total_frames = 0
+    try:
+        for n, group in enumerate(groups, 1):
+            clip_ayahs = [ayahs[i] for i in group]
+            start, end = timings[group[0]][0], timings[group[-1]][1]
+            name = f"clip_{n:02d}.mp4"
+            with tempfile.TemporaryDirectory() as tmp:
+                audio_file, _ = build_audio_track(reciter, clip_ayahs, os.path.join(tmp, "audio.m4a"),
+                                                  report=report)
+                duration = ffmpeg_parse_infos(audio_file)["duration"]
+                if visualizer:
+                    with span(report, "visualizer_levels"):
+                        levels = band_levels(audio_file, fps)
+
+                writer = open_writer(os.path.join(output_dir, name), (w, h), fps, audio_file)
+                n_frames = int(duration * fps)
+                clip_timings = [(timings[i][0] - start, timings[i][1] - start) for i in group]
+                verses, opacity, shift, reveal = transition_table(transition, clip_timings, fps, n_frames)
+                words = word_table(clip_ayahs, clip_timings, word_timings or {}, verses, fps)
+                shown = word_reveal_table(transition, clip_timings, verses, [len(boxes[v]) for v in group], fps)
+                if shown is not None and steps is None:
+                    steps = [word_reveal_steps(b) for b in boxes]
+                try:
+                    with span(report, "write_videofile"):
+                        for i in range(n_frames):
+                            # The background keeps running across clips, so decoding only moves forward
+                            frame = bg_clip.get_frame((start + i / fps) % bg_clip.duration)
+                            verse = group[verses[i]]
+                            dy = int(shift[i] * SLIDE_DISTANCE * h)
+                            visible = len(boxes[verse]) if shown is None else shown[i]
+                            hidden = steps[verse][visible] if shown is not None else ()
+                            out = blend(frame[y:y + h, x:x + w].copy(), layers[verse], opacity[i], dy, reveal[i],
+                                        hidden)
+                            if 0 <= words[i] < visible and reveal[i] >= 1:
+                                highlight(out, layers[verse], boxes[verse][words[i]], opacity[i], dy)
+                            if visualizer and i < len(levels):
+                                draw_bars(out, levels[i], strip)
+                            writer.write_frame(out)
+                finally:
+                    writer.close()
+            total_frames += n_frames
+
+            index["clips"].append({
+                "file": name,
+                "ayahs": [f"{s}:{v}" for s, v in clip_ayahs],
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "duration": round(duration, 3),
+                "over_limit": end - start > max_seconds,
+            })
+            if progress_bar:
+                progress_bar.progress(n / len(groups))
+    finally:
+        bg_clip.close()
+    count(report, "frames_encoded", total_frames)
+
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    return index
@@ -0,0 +1,108 @@
+import os
+import json
+import threading
+import subprocess
+import numpy as np
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from timing import span
+from ffmpeg_tools import ffmpeg_binary
+from catalog import DATA_DIR
+from readability import BAND_HEIGHT
+
+# Text colors chosen from the background. Each loop is decoded once at low
+# resolution, the luminance of the band behind the verse card is measured
+# per frame and per second of loop with array ops, and the chosen palette
+# is kept in a small catalog next to the prepared backgrounds. Rendering
+# only looks the palette up; the colors are baked into the cached cards.
+
+# ---------------- SETTINGS ----------------
+CATALOG_PATH = os.path.join(DATA_DIR, "cache", "backgrounds", "catalog.json")
+ANALYSIS_VERSION = 1
+ANALYSIS_WIDTH = 160
+SEGMENT_SECONDS = 1.0
+DARK_TEXT_LUMA = 0.6        # band brighter than this on average in any segment: dark text
+OUTLINE_LUMA = 0.45         # highlights (90th percentile) above this: outlined light text
+BUSY_CONTRAST = 0.2         # luminance spread above this: outlined light text
+# Palettes in the shape of layout.DEFAULT_PALETTE
+PALETTES = {
+    "light": ("white", "gray", 0, None),
+    "outlined": ("white", "#d8d8d8", 2, "black"),
+    "dark": ("black", "#303030", 1, "white"),
+}
+
+_catalog_lock = threading.Lock()
+
+
+# ---------------- ANALYSIS ----------------
+def band_luminance(bg_path, width=ANALYSIS_WIDTH):
+    """(frames, rows, columns) luminance 0..1 of the text band of every loop frame"""
+    w, h = ffmpeg_parse_infos(bg_path)["video_size"]
+    height = max(2, int(round(h * width / w / 2)) * 2)
+    cmd = [ffmpeg_binary(), "-v", "error", "-i", bg_path,
+           "-vf", f"scale={width}:{height},format=gray", "-f", "rawvideo", "-"]
+    raw = subprocess.run(cmd, check=True, capture_output=True).stdout
+    frames = np.frombuffer(raw, dtype=np.uint8).reshape(-1, height, width)
+    top = int(height * (1 - BAND_HEIGHT) / 2)
+    return frames[:, top:height - top].astype(np.float32) / 255
+
+def analyze_background(bg_path):
+    """Luminance statistics of the text band per loop segment, and the palette they call for"""
+    luma = band_luminance(bg_path)
+    fps = ffmpeg_parse_infos(bg_path)["video_fps"]
+    flat = luma.reshape(len(luma), -1)
+    means = flat.mean(axis=1)
+    highs = np.percentile(flat, 90, axis=1)
+    spreads = flat.std(axis=1)
+
+    per_segment = max(1, int(round(fps * SEGMENT_SECONDS)))
+    starts = np.arange(0, len(luma), per_segment)
+    seg_means = np.add.reduceat(means, starts) / np.diff(np.append(starts, len(luma)))
+    seg_highs = np.maximum.reduceat(highs, starts)
+    seg_spreads = np.maximum.reduceat(spreads, starts)
+
+    # The whole loop gets one palette, chosen for its hardest segment
+    if seg_means.max() > DARK_TEXT_LUMA:
+        palette = "dark"
+    elif seg_highs.max() > OUTLINE_LUMA or seg_spreads.max() > BUSY_CONTRAST:
+        palette = "outlined"
+    else:
+        palette = "light"
+    segments = [{"start": round(i / fps, 2), "mean": round(float(m), 3), "p90": round(float(p), 3),
+                 "spread": round(float(d), 3)}
+                for i, m, p, d in zip(starts, seg_means, seg_highs, seg_spreads)]
+    return {"palette": palette, "mean": round(float(means.mean()), 3), "segments": segments}
+
+
+# ---------------- CATALOG ----------------
+def catalog_key(bg_path):
+    stat = os.stat(bg_path)
+    return f"{os.path.basename(bg_path)}:{stat.st_size}:{int(stat.st_mtime)}:{ANALYSIS_VERSION}"
+
+def load_catalog():
+    if not os.path.exists(CATALOG_PATH):
+        return {}
+    with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def background_analysis(bg_path, report=None):
+    """Cached analyze_background result for a background loop"""
+    key = catalog_key(bg_path)
+    with _catalog_lock:
+        catalog = load_catalog()
+        if key in catalog:
+            return catalog[key]
+    with span(report, "analyze_background"):
+        analysis = analyze_background(bg_path)
+    with _catalog_lock:
+        catalog = load_catalog()
+        catalog[key] = analysis
+        os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+        tmp = f"{CATALOG_PATH}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, indent=1, sort_keys=True)
+        os.replace(tmp, CATALOG_PATH)
+    return analysis
+
+def background_palette(bg_path, report=None):
+    """Text palette for a background, in the shape of layout.DEFAULT_PALETTE"""
+    return PALETTES[background_analysis(bg_path, report)["palette"]]
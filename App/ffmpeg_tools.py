@@ -0,0 +1,49 @@
+import os
+import tempfile
+import contextlib
+import subprocess
+
+# ffmpeg plumbing shared by the render, audio and export modules: the binary
+# moviepy resolved, a quiet runner and concat demuxer lists. moviepy is
+# imported lazily so command-line tools that only need ffmpeg do not pay
+# for it.
+
+
+# ---------------- FFMPEG ----------------
+def ffmpeg_binary():
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+def run_ffmpeg(*args, **kwargs):
+    """Run ffmpeg quietly, overwriting outputs; raises CalledProcessError with its stderr"""
+    return subprocess.run([ffmpeg_binary(), "-y", "-v", "error", *args],
+                          check=True, capture_output=True, **kwargs)
+
+
+# ---------------- CONCAT ----------------
+@contextlib.contextmanager
+def concat_list(entries):
+    """Path of a temporary concat demuxer list, removed on exit.
+
+    Each entry is a file path, or (path, directives) where directives is a
+    list of (name, value) pairs such as [("inpoint", 0), ("duration", "1.5")]
+    written after the file line.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        for entry in entries:
+            path, directives = (entry, ()) if isinstance(entry, str) else entry
+            quoted = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{quoted}'\n")
+            for name, value in directives:
+                f.write(f"{name} {value}\n")
+        list_path = f.name
+    try:
+        yield list_path
+    finally:
+        os.unlink(list_path)
+
+def concat_copy(entries, output_path, *options):
+    """Join entries (as for concat_list) into output_path by stream copy"""
+    with concat_list(entries) as list_path:
+        run_ffmpeg("-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", *options, output_path)
+    return output_path
@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import tempfile
+from moviepy.editor import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+import layout
+from timing import span, count
+from catalog import DATA_DIR, FONT_PATH, CHAPTERS, verse_texts
+from pipeline import CARD_MARGIN, CARD_HEIGHT
+from compositor import OUTPUT_PROFILES, crop_box, card_layer, blend
+from transitions import transition_table
+from segments import file_fingerprint
+from ffmpeg_tools import run_ffmpeg, concat_copy
+
+# Surah title, Bismillah and outro cards. Each card is drawn over the start
+# of the background loop with a fade, encoded once per (surah, style,
+# background, size) with the same x264 settings as the main renders, and
+# cached. Adding them to a render is a stream-copy concatenation, so intros
+# cost nothing after the first render that uses them.
+
+# ---------------- SETTINGS ----------------
+INTROS_DIR = os.path.join(DATA_DIR, "cache", "intros")
+INTRO_VERSION = 1
+INTRO_SECONDS = {"title": 3.0, "bismillah": 3.0, "outro": 3.0}
+AUDIO_RATE = 44100
+AAC_FRAME = 1024
+# Surahs whose recitation has no separate Bismillah card: Al-Fatihah opens
+# with it as its first ayah and At-Tawbah has none
+NO_BISMILLAH = {1, 9}
+OUTRO_ARABIC = "صَدَقَ ٱللَّهُ ٱلۡعَظِيمُ"
+
+
+# ---------------- CARDS ----------------
+def card_texts(kind, surah):
+    """(arabic, english) shown on an intro or outro card"""
+    chapter = CHAPTERS[surah]
+    if kind == "title":
+        return (f"سورة {chapter['name']}",
+                f"{chapter['transliteration']} - {chapter['translation']} - "
+                f"{chapter['type'].capitalize()}, {chapter['total_verses']} ayahs")
+    if kind == "bismillah":
+        return verse_texts(1, 1)
+    if kind == "outro":
+        return OUTRO_ARABIC, f"Allah the Almighty has spoken the truth - Surah {chapter['transliteration']}"
+    raise ValueError(f"Unknown card {kind!r}; use one of {', '.join(INTRO_SECONDS)}")
+
+def intro_cards(surah, title=True, bismillah=True):
+    """Kinds of card to open a render of surah with"""
+    cards = ["title"] if title else []
+    if bismillah and surah not in NO_BISMILLAH:
+        cards.append("bismillah")
+    return cards
+
+
+# ---------------- SEGMENTS ----------------
+def card_segment_path(kind, surah, bg_path, size, font_path=FONT_PATH, palette=None):
+    key = json.dumps([INTRO_VERSION, kind, card_texts(kind, surah), INTRO_SECONDS[kind],
+                      file_fingerprint(bg_path), list(size), os.path.basename(font_path),
+                      CARD_MARGIN, CARD_HEIGHT, layout.style_key(palette=palette)], ensure_ascii=False)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(INTROS_DIR, digest[:2], f"{digest}.mp4")
+
+def render_card_segment(kind, surah, bg_path, aspect=None, font_path=FONT_PATH, palette=None, report=None):
+    """Encode one card over the background into the intro cache; returns its path.
+
+    aspect is a key of compositor.OUTPUT_PROFILES, or None for the
+    background's own framing, and must match the render it is joined to.
+    """
+    x, y, w, h = crop_box(ffmpeg_parse_infos(bg_path)["video_size"], OUTPUT_PROFILES.get(aspect))
+    path = card_segment_path(kind, surah, bg_path, (w, h), font_path, palette)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    bg_clip = VideoFileClip(bg_path, audio=False)
+    fps = bg_clip.fps
+    n_frames = int(round(INTRO_SECONDS[kind] * fps))
+    # Whole AAC frames no longer than the video, so the segment's duration is
+    # its video duration and the joined streams stay in step
+    audio_seconds = int(n_frames / fps * AUDIO_RATE) // AAC_FRAME * AAC_FRAME / AUDIO_RATE
+    layer = card_layer(*card_texts(kind, surah), w, h, font_path, palette)
+    _, opacity, _, _ = transition_table("fade", [(0, n_frames / fps)], fps, n_frames)
+    tmp = f"{path}.{os.getpid()}.tmp.mp4"
+    with tempfile.TemporaryDirectory() as work:
+        # Silent AAC in the same layout as the recitation track so the audio can be copied too
+        silence = os.path.join(work, "silence.m4a")
+        run_ffmpeg("-f", "lavfi", "-i", f"anullsrc=r={AUDIO_RATE}:cl=stereo", "-t", f"{audio_seconds:.6f}",
+                   "-c:a", "aac", silence)
+        # Same encoder settings as compositor.open_writer and write_video, plus a closed GOP
+        writer = FFMPEG_VideoWriter(tmp, (w, h), fps, codec="libx264", audiofile=silence, preset="ultrafast",
+                                    threads=4, ffmpeg_params=["-sc_threshold", "0", "-flags", "+cgop",
+                                                              "-g", str(int(round(fps)))])
+        try:
+            with span(report, "render_intros"):
+                for i in range(n_frames):
+                    frame = bg_clip.get_frame(i / fps % bg_clip.duration)
+                    writer.write_frame(blend(frame[y:y + h, x:x + w].copy(), layer, opacity[i]))
+        finally:
+            writer.close()
+            bg_clip.close()
+    count(report, "frames_encoded", n_frames)
+    os.replace(tmp, path)
+    return path
+
+def add_intros(output_path, surah, bg_path, cards, outro=False, aspect=None, font_path=FONT_PATH,
+               palette=None, report=None):
+    """Prepend the given cards (and append the outro) to output_path by stream copy"""
+    if not cards and not outro:
+        return output_path
+    paths = [render_card_segment(kind, surah, bg_path, aspect, font_path, palette, report) for kind in cards]
+    paths.append(output_path)
+    if outro:
+        paths.append(render_card_segment("outro", surah, bg_path, aspect, font_path, palette, report))
+
+    joined = f"{os.path.splitext(output_path)[0]}.intros.mp4"
+    with span(report, "concat_intros"):
+        concat_copy(paths, joined, "-movflags", "+faststart")
+    os.replace(joined, output_path)
+    return output_path
@@ -0,0 +1,57 @@
+import os
+import json
+import functools
+import numpy as np
+from catalog import MIRROR_DIR
+
+# Word-by-word highlighting. Word timings come from a words.json file next
+# to the reciter's mirrored recitation:
+#
+#     {"2:255": [[1, 0, 640], [2, 640, 1010], ...], ...}
+#
+# each entry is [word position (1-based), start ms, end ms] measured from
+# the start of that ayah's audio, as in quran.com's per-ayah segments. The
+# active word for every output frame is resolved up front; the card itself
+# is drawn once and the word is recolored inside its box at blend time.
+
+# ---------------- SETTINGS ----------------
+WORD_TIMINGS_FILE = "words.json"
+HIGHLIGHT_COLOR = (255, 200, 60)
+
+
+# ---------------- TIMINGS ----------------
+def word_timings_path(reciter):
+    return os.path.join(MIRROR_DIR, reciter, WORD_TIMINGS_FILE)
+
+@functools.lru_cache(maxsize=8)
+def _load_word_timings(path, mtime):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_word_timings(reciter):
+    """The reciter's word timings keyed by "surah:ayah", or {} when there are none"""
+    path = word_timings_path(reciter)
+    if not os.path.isfile(path):
+        return {}
+    return _load_word_timings(path, os.path.getmtime(path))
+
+def word_table(ayahs, timings, word_timings, verses, fps):
+    """Active word index (0-based, -1 for none) at every output frame.
+
+    verses is the per-frame ayah index from transitions.transition_table.
+    """
+    words = np.full(len(verses), -1, dtype=np.int32)
+    t = np.arange(len(verses)) / fps * 1000
+    for i, ((surah, verse), (start, _)) in enumerate(zip(ayahs, timings)):
+        segments = sorted(word_timings.get(f"{surah}:{verse}") or [], key=lambda s: s[1])
+        if not segments:
+            continue
+        frames = np.flatnonzero(verses == i)
+        local = t[frames] - start * 1000
+        positions = np.array([s[0] for s in segments]) - 1
+        starts = np.array([s[1] for s in segments])
+        ends = np.array([s[2] for s in segments])
+        k = np.searchsorted(starts, local, side="right") - 1
+        inside = (k >= 0) & (local < ends[np.maximum(k, 0)])
+        words[frames[inside]] = positions[k[inside]]
+    return words
@@ -0,0 +1,241 @@
+import os
+import json
+import hashlib
+import functools
+import arabic_reshaper
+from bidi.algorithm import get_display
+from PIL import Image, ImageDraw, ImageFont, features
+
+# ---------------- LAYOUT SETTINGS ----------------
+MAX_FONT_SIZE = 50
+MIN_FONT_SIZE = 14
+ENGLISH_SCALE = 0.6     # English size relative to the Arabic size
+LINE_SPACING = 1.1
+BLOCK_GAP = 0.4         # gap between Arabic and English, in Arabic lines
+PADDING = 10
+
+ARABIC_COLOR = "white"
+ENGLISH_COLOR = "gray"
+# (arabic color, english color, outline width, outline color); contrast.py
+# picks one of these per background
+DEFAULT_PALETTE = (ARABIC_COLOR, ENGLISH_COLOR, 0, None)
+
+# "raqm" shapes with HarfBuzz/FriBidi inside Pillow; "basic" falls back to
+# arabic_reshaper + python-bidi when Pillow was built without libraqm.
+RAQM_AVAILABLE = features.check("raqm")
+SHAPING_ENGINE = "raqm" if RAQM_AVAILABLE else "basic"
+
+
+# ---------------- FONTS & SHAPING ----------------
+def resolve_engine(engine=None):
+    engine = engine or SHAPING_ENGINE
+    if engine == "raqm" and not RAQM_AVAILABLE:
+        return "basic"
+    return engine
+
+@functools.lru_cache(maxsize=128)
+def load_font(font_path, size, engine="basic"):
+    if engine == "raqm":
+        return ImageFont.truetype(font_path, size, layout_engine=ImageFont.Layout.RAQM)
+    return ImageFont.truetype(font_path, size, layout_engine=ImageFont.Layout.BASIC)
+
+@functools.lru_cache(maxsize=8192)
+def shape_arabic(text, engine="basic"):
+    """Reshape Arabic letters into their joined forms (logical order).
+
+    raqm shapes while drawing, so the text is passed through unchanged.
+    """
+    if engine == "raqm":
+        return text
+    return arabic_reshaper.reshape(text)
+
+@functools.lru_cache(maxsize=8192)
+def to_visual(line, engine="basic"):
+    """Reorder one shaped line for left-to-right drawing"""
+    if engine == "raqm":
+        return line
+    return get_display(line)
+
+def text_options(engine, rtl):
+    """Extra draw/measure arguments for Pillow's raqm layout"""
+    if engine == "raqm" and rtl:
+        return {"direction": "rtl", "language": "ar"}
+    return {}
+
+
+def style_key(engine=None, palette=None):
+    """Every setting besides the text and card size that changes a card"""
+    return (MAX_FONT_SIZE, MIN_FONT_SIZE, ENGLISH_SCALE, LINE_SPACING, BLOCK_GAP,
+            PADDING, *(palette or DEFAULT_PALETTE), resolve_engine(engine))
+
+def card_key(arabic, english, font_path, width, height, engine=None, palette=None):
+    """Content hash of a card; identical verses share one key"""
+    key = json.dumps([arabic, english, os.path.basename(font_path), width, height, style_key(engine, palette)],
+                     ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+# ---------------- LINE BREAKING ----------------
+@functools.lru_cache(maxsize=65536)
+def word_width(word, font_path, size, engine="basic", rtl=False):
+    font = load_font(font_path, size, engine)
+    return font.getlength(word, **text_options(engine, rtl))
+
+@functools.lru_cache(maxsize=16384)
+def wrap_text(text, font_path, size, width, engine="basic", rtl=False):
+    """Greedy word wrap of text into lines no wider than width pixels.
+
+    Arabic must be passed already shaped but still in logical order, so
+    lines are broken first and reordered for display afterwards.
+    Returns (lines, fits) where fits is False if a single word is wider
+    than the line.
+    """
+    space = word_width(" ", font_path, size, engine, rtl)
+    lines, current, current_width = [], [], 0
+    fits = True
+    for word in text.split():
+        w = word_width(word, font_path, size, engine, rtl)
+        if w > width:
+            fits = False
+        if current and current_width + space + w > width:
+            lines.append(" ".join(current))
+            current, current_width = [word], w
+        else:
+            current_width += (space if current else 0) + w
+            current.append(word)
+    if current:
+        lines.append(" ".join(current))
+    return tuple(lines), fits
+
+def line_height(font_path, size, engine="basic"):
+    ascent, descent = load_font(font_path, size, engine).getmetrics()
+    return int((ascent + descent) * LINE_SPACING)
+
+def english_size(size):
+    return max(MIN_FONT_SIZE, int(size * ENGLISH_SCALE))
+
+def measure_block(arabic, english, font_path, size, width, engine="basic"):
+    """Return (arabic_lines, english_lines, block_height, fits)"""
+    shaped = shape_arabic(arabic, engine)
+    ar_lines, ar_fits = wrap_text(shaped, font_path, size, width, engine, True)
+    en_size = english_size(size)
+    en_lines, en_fits = wrap_text(english, font_path, en_size, width, engine)
+    height = len(ar_lines) * line_height(font_path, size, engine)
+    if en_lines:
+        height += int(line_height(font_path, size, engine) * BLOCK_GAP)
+        height += len(en_lines) * line_height(font_path, en_size, engine)
+    return ar_lines, en_lines, height, ar_fits and en_fits
+
+@functools.lru_cache(maxsize=8192)
+def fit_font_size(arabic, english, font_path, width, height, engine="basic"):
+    """Binary search the largest Arabic font size whose block fits the card"""
+    inner_w, inner_h = width - 2 * PADDING, height - 2 * PADDING
+    lo, hi, best = MIN_FONT_SIZE, MAX_FONT_SIZE, MIN_FONT_SIZE
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        _, _, block_h, fits = measure_block(arabic, english, font_path, mid, inner_w, engine)
+        if fits and block_h <= inner_h:
+            best, lo = mid, mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+# ---------------- VERSE CARDS ----------------
+@functools.lru_cache(maxsize=1024)
+def layout_verse_card(arabic, english, font_path, width, height, engine=None):
+    """Place every line of a card once, for drawing and for word boxes.
+
+    Returns (height, lines) where each line is (x, y, visual_text,
+    logical_text, size, rtl). Verses too long for the card even at
+    MIN_FONT_SIZE grow the card height instead of being cut off.
+    """
+    engine = resolve_engine(engine)
+    size = fit_font_size(arabic, english, font_path, width, height, engine)
+    inner_w = width - 2 * PADDING
+    ar_lines, en_lines, block_h, _ = measure_block(arabic, english, font_path, size, inner_w, engine)
+    en_size = english_size(size)
+    ar_options = text_options(engine, True)
+    height = max(height, block_h + 2 * PADDING)
+    y = max(PADDING, (height - block_h) // 2)
+
+    lines = []
+    font = load_font(font_path, size, engine)
+    for line in ar_lines:
+        visual = to_visual(line, engine)
+        x = (width - font.getlength(visual, **ar_options)) / 2
+        lines.append((x, y, visual, line, size, True))
+        y += line_height(font_path, size, engine)
+
+    if en_lines:
+        y += int(line_height(font_path, size, engine) * BLOCK_GAP)
+    en_font = load_font(font_path, en_size, engine)
+    for line in en_lines:
+        x = (width - en_font.getlength(line)) / 2
+        lines.append((x, y, line, line, en_size, False))
+        y += line_height(font_path, en_size, engine)
+    return height, tuple(lines)
+
+def render_verse_card(arabic, english, font_path, width, height, engine=None, palette=None):
+    """Draw a transparent RGBA card with wrapped, centered Arabic and English.
+
+    engine picks "raqm" or "basic" shaping and defaults to the best one
+    available; palette overrides DEFAULT_PALETTE.
+    """
+    engine = resolve_engine(engine)
+    arabic_color, english_color, outline, outline_color = palette or DEFAULT_PALETTE
+    height, lines = layout_verse_card(arabic, english, font_path, width, height, engine)
+    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for x, y, visual, _, size, rtl in lines:
+        draw.text((x, y), visual, font=load_font(font_path, size, engine),
+                  fill=arabic_color if rtl else english_color, stroke_width=outline,
+                  stroke_fill=outline_color, **text_options(engine, rtl))
+    return img
+
+def render_fill_mask(arabic, english, font_path, width, height, engine=None):
+    """Grayscale mask of the Arabic glyphs alone, without any outline, in
+    render_verse_card's layout"""
+    engine = resolve_engine(engine)
+    height, lines = layout_verse_card(arabic, english, font_path, width, height, engine)
+    img = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(img)
+    for x, y, visual, _, size, rtl in lines:
+        if rtl:
+            draw.text((x, y), visual, font=load_font(font_path, size, engine), fill=255,
+                      **text_options(engine, rtl))
+    return img
+
+@functools.lru_cache(maxsize=1024)
+def word_boxes(arabic, english, font_path, width, height, engine=None):
+    """(x0, y0, x1, y1) of every Arabic word on the card, in reading order.
+
+    Boxes come from the same layout the card is drawn with, so nothing
+    is rasterized; a word's box spans its whole line height.
+    """
+    engine = resolve_engine(engine)
+    _, lines = layout_verse_card(arabic, english, font_path, width, height, engine)
+    boxes = []
+    for x, y, visual, logical, size, rtl in lines:
+        if not rtl:
+            continue
+        font = load_font(font_path, size, engine)
+        options = text_options(engine, rtl)
+        bottom = y + line_height(font_path, size, engine)
+        line_words = []
+        if engine == "raqm":
+            # Drawn right to left from the logical text: measure from the right edge
+            right = x + font.getlength(logical, **options)
+            words = logical.split(" ")
+            for i, word in enumerate(words):
+                before = font.getlength(" ".join(words[:i] + [""]), **options) if i else 0
+                line_words.append((right - before - font.getlength(word, **options), right - before))
+        else:
+            # Visual order is the logical order reversed, word by word
+            words = visual.split(" ")
+            for i, word in enumerate(words):
+                start = x + (font.getlength(" ".join(words[:i] + [""])) if i else 0)
+                line_words.append((start, start + font.getlength(word)))
+            line_words.reverse()
+        boxes.extend((int(x0), y, int(x1 + 0.999), bottom) for x0, x1 in line_words)
+    return tuple(boxes)
@@ -0,0 +1,233 @@
+"""Mirror every ayah of a reciter from RECITER_URLS into Data/mirror.
+
+Run from the App folder:
+
+    python mirror.py Alafasy --workers 4 --max-rate 2M
+
+Interrupted runs resume: partial files are continued with HTTP Range
+requests and finished files are checked against the manifest. For
+archive.org sources every download is also checked against the MD5 the
+item publishes in its <item>_files.xml; --verify re-hashes finished files
+against both. Once a reciter is mirrored, get_audio_url resolves to the
+local files.
+--base-url points the tool at another server, e.g. a local stand-in.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from catalog import RECITER_URLS, MIRROR_DIR, CHAPTERS, get_audio_url, mirror_audio_path
+
+# ---------------- SETTINGS ----------------
+CHUNK_SIZE = 64 * 1024
+MANIFEST_NAME = "manifest.json"
+# https://archive.org/download/<item>/<path inside the item>
+ARCHIVE_DOWNLOAD = re.compile(r"^(https?://[^/]+/download/([^/]+)/)(.*)$")
+
+
+# ---------------- HELPERS ----------------
+def all_ayahs(surahs=None):
+    """Every (surah, ayah) pair, using total_verses from chapters.json"""
+    for chapter in CHAPTERS.values():
+        if surahs and chapter["id"] not in surahs:
+            continue
+        for verse in range(1, chapter["total_verses"] + 1):
+            yield chapter["id"], verse
+
+def parse_rate(text):
+    """'500K' / '2M' / '1048576' -> bytes per second"""
+    if not text:
+        return None
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def hash_file(path):
+    """(sha256, md5) hex digests of a file, in one read"""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+            md5.update(block)
+    return sha256.hexdigest(), md5.hexdigest()
+
+def upstream_md5s(base_url, session):
+    """{file name: md5} published by an archive.org item, or {} for other sources"""
+    match = ARCHIVE_DOWNLOAD.match(base_url)
+    if not match:
+        return {}
+    root, item, prefix = match.groups()
+    r = session.get(f"{root}{item}_files.xml", timeout=60)
+    r.raise_for_status()
+    md5s = {}
+    for node in ET.fromstring(r.content).iter("file"):
+        name, md5 = node.get("name", ""), node.findtext("md5")
+        if md5 and name.startswith(prefix) and "/" not in name[len(prefix):]:
+            md5s[name[len(prefix):]] = md5.lower()
+    return md5s
+
+
+class RateLimiter:
+    """Shared bandwidth cap across all download threads"""
+
+    def __init__(self, bytes_per_second=None):
+        self.rate = bytes_per_second
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+
+    def consume(self, amount):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.next_time = max(now, self.next_time) + amount / self.rate
+            delay = self.next_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# ---------------- DOWNLOAD ----------------
+def download_file(url, path, limiter, session):
+    """Download url to path, resuming from path.part; returns the final size"""
+    part = path + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with session.get(url, headers=headers, stream=True, timeout=60) as r:
+        if r.status_code == 416:
+            # Nothing left to fetch: the partial file is already complete
+            expected = offset
+        elif r.status_code == 206:
+            expected = int(r.headers["Content-Range"].rsplit("/", 1)[1])
+        elif r.status_code == 200:
+            offset = 0
+            expected = int(r.headers["Content-Length"]) if "Content-Length" in r.headers else None
+        else:
+            raise Exception(f"Failed to download {url} (HTTP {r.status_code})")
+
+        if r.status_code != 416:
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    limiter.consume(len(chunk))
+
+    size = os.path.getsize(part)
+    if expected is not None and size != expected:
+        raise Exception(f"Size mismatch for {url}: got {size}, expected {expected}")
+    os.replace(part, path)
+    return size
+
+def is_verified(path, entry, check_hashes):
+    """Present with the manifest's size; with check_hashes, also its sha256
+    and the upstream md5 when one is known"""
+    if not entry or not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+        return False
+    if not check_hashes:
+        return True
+    sha256, md5 = hash_file(path)
+    return sha256 == entry["sha256"] and entry.get("md5", md5) == md5
+
+
+# ---------------- MIRROR ----------------
+def mirror_reciter(reciter, base_url=None, workers=4, max_rate=None, surahs=None,
+                   check_hashes=False, progress=None):
+    """Mirror one reciter; returns (downloaded, skipped, failed) counts"""
+    if base_url:
+        RECITER_URLS[reciter] = base_url
+    dest = os.path.join(MIRROR_DIR, reciter)
+    os.makedirs(dest, exist_ok=True)
+    manifest_path = os.path.join(dest, MANIFEST_NAME)
+    manifest = {"reciter": reciter, "source": RECITER_URLS[reciter], "files": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest["files"] = json.load(f).get("files", {})
+
+    session = requests.Session()
+    upstream = upstream_md5s(RECITER_URLS[reciter], session)
+    for name, entry in manifest["files"].items():
+        if name in upstream:
+            entry["md5"] = upstream[name]
+
+    todo = []
+    for surah, verse in all_ayahs(surahs):
+        path = mirror_audio_path(reciter, surah, verse)
+        if not is_verified(path, manifest["files"].get(os.path.basename(path)), check_hashes):
+            todo.append((surah, verse, path))
+    skipped = sum(1 for _ in all_ayahs(surahs)) - len(todo)
+
+    limiter = RateLimiter(max_rate)
+    failed = []
+
+    def fetch(surah, verse, path):
+        url = get_audio_url(reciter, surah, verse, remote=True)
+        size = download_file(url, path, limiter, session)
+        name = os.path.basename(path)
+        sha256, md5 = hash_file(path)
+        entry = {"size": size, "sha256": sha256}
+        if name in upstream:
+            if md5 != upstream[name]:
+                os.unlink(path)
+                raise Exception(f"MD5 mismatch for {url}: got {md5}, archive.org lists {upstream[name]}")
+            entry["md5"] = md5
+        return name, entry
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, *item): item for item in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                name, entry = future.result()
+                manifest["files"][name] = entry
+            except Exception as e:
+                failed.append((futures[future][:2], str(e)))
+            if progress:
+                progress(i, len(todo))
+            if i % 100 == 0 or i == len(todo):
+                write_manifest(manifest_path, manifest)
+
+    write_manifest(manifest_path, manifest)
+    return len(todo) - len(failed), skipped, failed
+
+def write_manifest(path, manifest):
+    manifest["files"] = dict(sorted(manifest["files"].items()))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mirror a reciter's per-ayah MP3s locally")
+    parser.add_argument("reciter", help=f"one of {', '.join(RECITER_URLS)}")
+    parser.add_argument("--base-url", help="download from this URL instead of RECITER_URLS")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent downloads")
+    parser.add_argument("--max-rate", help="total bandwidth cap, e.g. 500K or 2M bytes/s")
+    parser.add_argument("--surahs", nargs="+", type=int, help="only mirror these surahs")
+    parser.add_argument("--verify", action="store_true",
+                        help="re-hash finished files against the manifest and archive.org's MD5s")
+    args = parser.parse_args(argv)
+    if args.reciter not in RECITER_URLS and not args.base_url:
+        parser.error(f"unknown reciter {args.reciter!r}")
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    downloaded, skipped, failed = mirror_reciter(
+        args.reciter, args.base_url, args.workers, parse_rate(args.max_rate),
+        args.surahs, args.verify, progress
+    )
+    print(f"\n{downloaded} downloaded, {skipped} already mirrored, {len(failed)} failed", file=sys.stderr)
+    for (surah, verse), error in failed:
+        print(f"  {surah}:{verse} {error}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
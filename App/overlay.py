@@ -0,0 +1,134 @@
+import os
+import json
+import shutil
+import tempfile
+from PIL import Image
+from layout import render_verse_card, card_key
+from timing import span, count
+from catalog import FONT_PATH, selection_label
+from pipeline import CARD_MARGIN, CARD_HEIGHT, verse_texts
+from subtitles import build_cues, to_srt
+from ffmpeg_tools import run_ffmpeg, concat_list, concat_copy
+
+# Verse text only, on transparency, for compositing in an editor's own
+# NLE. No background is read. Each distinct card is drawn once as a
+# full-frame PNG. The PNG sequence hard-links those files per frame; the
+# intra-only codecs (ProRes, Animation) encode each card as one frame and
+# repeat that packet by stream copy; WebM encodes the stills, which VP9
+# codes almost for free after the first frame.
+
+# ---------------- SETTINGS ----------------
+OVERLAY_SIZE = (1920, 1080)
+OVERLAY_FPS = 30
+# name -> (extension, ffmpeg video options, intra-only); None is the PNG sequence
+OVERLAY_FORMATS = {
+    "png": None,
+    "prores": (".mov", ["-c:v", "prores_ks", "-profile:v", "4444", "-pix_fmt", "yuva444p10le"], True),
+    "qtrle": (".mov", ["-c:v", "qtrle", "-pix_fmt", "argb"], True),
+    "webm": (".webm", ["-c:v", "libvpx-vp9", "-pix_fmt", "yuva420p", "-auto-alt-ref", "0",
+                       "-deadline", "realtime", "-cpu-used", "8", "-b:v", "0", "-crf", "30"], False),
+}
+
+
+# ---------------- HELPERS ----------------
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def write_intra(cards, frames, output_path, options, fps, work_dir):
+    """Encode each distinct card once and repeat its packet for every frame;
+    returns the number of frames actually encoded"""
+    encoded, segments = {}, []
+    for n, (card, length) in enumerate(zip(cards, frames)):
+        if length <= 0:
+            continue
+        if card not in encoded:
+            encoded[card] = os.path.join(work_dir, f"card{len(encoded)}{os.path.splitext(output_path)[1]}")
+            run_ffmpeg("-framerate", str(fps), "-i", card, "-frames:v", "1", *options, encoded[card])
+        segment = os.path.join(work_dir, f"ayah{n}{os.path.splitext(output_path)[1]}")
+        run_ffmpeg("-stream_loop", str(length - 1), "-i", encoded[card], "-c", "copy", segment)
+        segments.append(segment)
+    concat_copy(segments, output_path)
+    return len(encoded)
+
+def write_stills(cards, frames, output_path, options, fps):
+    """Encode the stills as a video, each shown for its ayah's frames"""
+    entries = [(card, [("duration", f"{length / fps:.6f}")]) for card, length in zip(cards, frames)]
+    # The concat demuxer ignores the last duration unless the file repeats
+    with concat_list(entries + [cards[-1]]) as list_path:
+        run_ffmpeg("-f", "concat", "-safe", "0", "-i", list_path,
+                   "-vf", f"fps={fps}", "-frames:v", str(sum(frames)), *options, output_path)
+
+def write_card_frames(ayahs, size, cards_dir, font_path=FONT_PATH):
+    """Draw each distinct card once, centered on a transparent frame; returns one path per ayah"""
+    os.makedirs(cards_dir, exist_ok=True)
+    width, height = size
+    paths = []
+    for surah, verse in ayahs:
+        arabic, english = verse_texts(surah, verse)
+        path = os.path.join(cards_dir, card_key(arabic, english, font_path, width, height) + ".png")
+        if not os.path.exists(path):
+            card = render_verse_card(arabic, english, font_path, width - CARD_MARGIN, CARD_HEIGHT)
+            if card.height > height:
+                top = (card.height - height) // 2
+                card = card.crop((0, top, card.width, top + height))
+            frame = Image.new("RGBA", size, (0, 0, 0, 0))
+            frame.paste(card, ((width - card.width) // 2, (height - card.height) // 2))
+            frame.save(path, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+# ---------------- EXPORT ----------------
+def export_overlay(reciter, audio_path, ayahs, timings, output_dir, fmt="prores", size=OVERLAY_SIZE,
+                   fps=OVERLAY_FPS, font_path=FONT_PATH, report=None):
+    """Write the verse track with alpha, the recitation and the timing into output_dir.
+
+    Produces verses.mov/.webm (or frames/ for "png"), audio.wav,
+    timing.json and verses.srt. Returns the path of the video or frames.
+    """
+    if fmt not in OVERLAY_FORMATS:
+        raise ValueError(f"Unknown overlay format {fmt!r}; use one of {', '.join(OVERLAY_FORMATS)}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    with span(report, "prepare_text_images"):
+        cards = write_card_frames(ayahs, size, os.path.join(output_dir, "cards"), font_path)
+
+    with span(report, "encode_audio"):
+        run_ffmpeg("-i", audio_path, "-c:a", "pcm_s16le", os.path.join(output_dir, "audio.wav"))
+
+    # Frame-exact ayah spans on the output frame grid
+    frames = [round(end * fps) - round(start * fps) for start, end in timings]
+    with span(report, "write_overlay"):
+        encoded = 0
+        if OVERLAY_FORMATS[fmt] is None:
+            result = os.path.join(output_dir, "frames")
+            os.makedirs(result, exist_ok=True)
+            n = 0
+            for card, length in zip(cards, frames):
+                for _ in range(length):
+                    link_or_copy(card, os.path.join(result, f"{n:06d}.png"))
+                    n += 1
+        else:
+            ext, options, intra = OVERLAY_FORMATS[fmt]
+            result = os.path.join(output_dir, "verses" + ext)
+            if intra:
+                with tempfile.TemporaryDirectory() as tmp:
+                    encoded = write_intra(cards, frames, result, options, fps, tmp)
+            else:
+                write_stills(cards, frames, result, options, fps)
+                encoded = sum(frames)
+    count(report, "frames_encoded", encoded)
+
+    index = {"reciter": reciter, "selection": selection_label(ayahs), "fps": fps, "size": list(size),
+             "format": fmt, "ayahs": []}
+    for (surah, verse), (start, end), card, length in zip(ayahs, timings, cards, frames):
+        index["ayahs"].append({"ayah": f"{surah}:{verse}", "start": round(start, 3), "end": round(end, 3),
+                               "frames": length, "card": os.path.relpath(card, output_dir)})
+    with open(os.path.join(output_dir, "timing.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    with open(os.path.join(output_dir, "verses.srt"), "w", encoding="utf-8") as f:
+        f.write(to_srt(build_cues(ayahs, timings)))
+    return result
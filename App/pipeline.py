@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from moviepy.editor import (
+    VideoFileClip, AudioFileClip, ImageClip,
+    CompositeVideoClip
+)
+from moviepy.video.fx.loop import loop
+from layout import render_verse_card, render_fill_mask, card_key
+from timing import span, count
+from ffmpeg_tools import run_ffmpeg
+from catalog import FONT_PATH, verse_texts
+from prefetch import PREFETCHER
+
+# ---------------- SETTINGS ----------------
+CARD_MARGIN = 100       # card width = video width - CARD_MARGIN
+CARD_HEIGHT = 250
+CARD_CACHE_BYTES = 64 * 2**20   # card rasters kept in memory across renders
+
+# Card rasters interned by content hash: repeated verses (Ar-Rahman's
+# refrain, Al-Mursalat's) share one uint8 RGBA array (and outlined cards one
+# fill mask) however often they appear. Clips and their float masks are built per render and freed with it.
+_card_arrays = OrderedDict()
+_card_bytes = 0
+_card_lock = threading.Lock()
+
+# ---------------- HELPER FUNCTIONS ----------------
+def download_audio(reciter, ayahs, progress_bar=None, report=None):
+    """Concatenate the (surah, ayah) MP3s into one temp file, using the audio cache"""
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
+    total = len(ayahs)
+    for i, (surah, verse) in enumerate(ayahs):
+        path, fetched = PREFETCHER.fetch(reciter, surah, verse)
+        count(report, "bytes_fetched", fetched)
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, temp_file)
+        if progress_bar:
+            progress_bar.progress((i+1)/total)
+    temp_file.flush()
+    return temp_file.name
+
+def _cached_raster(key, render):
+    """Read-only array for key from the card cache, rendering it on a miss"""
+    global _card_bytes
+    with _card_lock:
+        if key in _card_arrays:
+            _card_arrays.move_to_end(key)
+            return _card_arrays[key]
+    img_array = np.array(render())
+    img_array.flags.writeable = False
+    with _card_lock:
+        if key not in _card_arrays:
+            _card_arrays[key] = img_array
+            _card_bytes += img_array.nbytes
+        _card_arrays.move_to_end(key)
+        while _card_bytes > CARD_CACHE_BYTES and len(_card_arrays) > 1:
+            _card_bytes -= _card_arrays.popitem(last=False)[1].nbytes
+        return _card_arrays[key]
+
+def card_array(arabic, english, width, height, font_path=FONT_PATH, palette=None):
+    """Read-only uint8 RGBA raster of a card, shared by every render that shows it"""
+    return _cached_raster(card_key(arabic, english, font_path, width, height, palette=palette),
+                          lambda: render_verse_card(arabic, english, font_path, width, height, palette=palette))
+
+def card_fill_mask(arabic, english, width, height, font_path=FONT_PATH):
+    """Read-only uint8 mask of a card's Arabic fill, without the outline; the
+    same for every palette"""
+    return _cached_raster(("fill", card_key(arabic, english, font_path, width, height)),
+                          lambda: render_fill_mask(arabic, english, font_path, width, height))
+
+def clear_card_cache():
+    global _card_bytes
+    with _card_lock:
+        _card_arrays.clear()
+        _card_bytes = 0
+
+def card_clip(arabic, english, width, height, font_path=FONT_PATH, palette=None):
+    """ImageClip (with mask) for a card, built from its cached raster"""
+    return ImageClip(card_array(arabic, english, width, height, font_path, palette))
+
+def prepare_text_images(ayahs, width, height, font_path, palette=None):
+    """One clip per ayah; repeated verses in a render are the same clip"""
+    clips = {}
+    for surah, verse in ayahs:
+        texts = verse_texts(surah, verse)
+        if texts not in clips:
+            clips[texts] = card_clip(*texts, width, height, font_path, palette)
+    return [clips[verse_texts(surah, verse)] for surah, verse in ayahs]
+
+def build_video(bg_path, audio_path, ayahs, font_path=FONT_PATH, report=None, timings=None, palette=None):
+    """Loop the background under the verse cards and attach the audio.
+
+    timings are (start, end) per ayah from audio_track.build_audio_track; without them
+    every ayah gets an equal share of the audio. palette is a
+    layout.DEFAULT_PALETTE-style tuple, e.g. from contrast.background_palette.
+    """
+    with span(report, "load_background"):
+        audio_clip = AudioFileClip(audio_path)
+
+        # Background video
+        bg_clip = VideoFileClip(bg_path)
+        final_bg = loop(bg_clip, duration=audio_clip.duration)
+
+    # Prepare text images
+    with span(report, "prepare_text_images"):
+        text_clips = prepare_text_images(ayahs, final_bg.size[0]-CARD_MARGIN, CARD_HEIGHT, font_path, palette)
+
+    with span(report, "composite"):
+        if timings is None:
+            verse_duration = audio_clip.duration / len(text_clips)
+            timings = [(i*verse_duration, (i+1)*verse_duration) for i in range(len(text_clips))]
+        for i, (clip, (start, end)) in enumerate(zip(text_clips, timings)):
+            end = min(end, audio_clip.duration)
+            text_clips[i] = clip.set_duration(end - start).set_start(start).set_position("center")
+
+        # Combine background + text + audio
+        final_clip = CompositeVideoClip([final_bg]+text_clips).set_audio(audio_clip)
+    return final_clip
+
+def is_aac(audio_path):
+    return os.path.splitext(audio_path)[1].lower() in (".m4a", ".aac")
+
+def mux_audio(video_path, audio_path, output_path):
+    """Stream-copy a video and an AAC track into output_path"""
+    run_ffmpeg("-i", video_path, "-i", audio_path, "-map", "0:v:0", "-map", "1:a:0",
+               "-c", "copy", "-movflags", "+faststart", output_path)
+    return output_path
+
+def write_video(final_clip, output_path, logger="bar", report=None, audio_track=None):
+    """Encode final_clip; with an AAC audio_track (audio_track.build_audio_track)
+    only the video is encoded and the track is muxed by stream copy."""
+    # Frames are composited lazily, so this span covers compositing and encoding
+    with span(report, "write_videofile"):
+        if audio_track is None:
+            final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", threads=4,
+                                       preset="ultrafast", logger=logger)
+        else:
+            video_only = f"{os.path.splitext(output_path)[0]}.video.mp4"
+            final_clip.write_videofile(video_only, codec="libx264", audio=False, threads=4,
+                                       preset="ultrafast", logger=logger)
+    count(report, "frames_encoded", int(round(final_clip.duration * final_clip.fps)))
+    if audio_track is not None:
+        try:
+            with span(report, "mux_audio"):
+                mux_audio(video_only, audio_track, output_path)
+        finally:
+            os.unlink(video_only)
+    return output_path
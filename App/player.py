@@ -0,0 +1,220 @@
+"""Playback-only page: the browser loops the background and switches verses
+in time with the recitation, so nothing is encoded on the server.
+
+Run from the App folder and open http://127.0.0.1:5000:
+
+    python player.py
+
+The server only sends the per-ayah manifest (text, audio URL, timing) and
+static files. Audio comes from Data/mirror or the render cache when a file
+is local and is otherwise redirected to the reciter's server.
+"""
+import os
+from flask import Flask, request, render_template_string, send_file, redirect, abort, url_for
+from catalog import (
+    BACKGROUNDS_DIR, FONT_PATH, CHAPTERS, SURAH_LIST, RECITER_URLS,
+    get_audio_url, parse_selection, selection_label, verse_texts
+)
+from prefetch import cached_audio_path
+from reciter_manifest import load_manifest, ayah_key
+
+app = Flask(__name__)
+
+BACKGROUND_TYPES = {".mp4": "video/mp4", ".mov": "video/quicktime", ".webm": "video/webm"}
+
+
+# ---------------- HELPERS ----------------
+def background_files():
+    return sorted(f for f in os.listdir(BACKGROUNDS_DIR) if os.path.splitext(f)[1].lower() in BACKGROUND_TYPES)
+
+def build_manifest(reciter, ayahs):
+    """Per-ayah text, audio URL and, when the reciter manifest knows them, start/end times"""
+    durations = (load_manifest(reciter) or {}).get("ayahs", {})
+    verses, t = [], 0.0
+    for surah, verse in ayahs:
+        arabic, english = verse_texts(surah, verse)
+        duration = durations.get(ayah_key(surah, verse), {}).get("duration")
+        entry = {"ref": f"{surah}:{verse}", "arabic": arabic, "english": english,
+                 "audio": url_for("serve_audio", reciter=reciter, name=f"{ayah_key(surah, verse)}.mp3")}
+        if t is not None and duration:
+            entry["start"], entry["end"] = round(t, 2), round(t + duration, 2)
+            t += duration
+        else:
+            t = None
+        verses.append(entry)
+    return verses
+
+
+# ---------------- PAGES ----------------
+FORM_HTML = """
+<html>
+<head>
+  <title>Quran Player</title>
+</head>
+<body>
+  <h2>Select Surah, Reciter & Background</h2>
+  <form method="GET" action="{{ url_for('play') }}">
+    Surah:
+    <select name="surah" required>
+      {% for name in surahs %}
+      <option value="{{ loop.index }}">{{ name }}</option>
+      {% endfor %}
+    </select><br><br>
+
+    Ayah Range (e.g 1-3 or 2:255, 3:190-194): <input type="text" name="range"><br><br>
+
+    Reciter:
+    <select name="reciter" required>
+      {% for reciter in reciters %}
+      <option value="{{ reciter }}">{{ reciter }}</option>
+      {% endfor %}
+    </select><br><br>
+
+    Background:
+    <select name="background" required>
+      {% for bg in backgrounds %}
+      <option value="{{ bg }}">{{ bg }}</option>
+      {% endfor %}
+    </select><br><br>
+
+    <input type="submit" value="Play">
+  </form>
+</body>
+</html>
+"""
+
+PLAYER_HTML = """
+<html>
+<head>
+  <title>{{ title }}</title>
+  <meta charset="utf-8">
+  <style>
+    @font-face { font-family: "Verse"; src: url("{{ url_for('serve_font') }}"); }
+    body { margin: 0; background: black; overflow: hidden; font-family: "Verse", serif; }
+    #background { position: fixed; inset: 0; width: 100%; height: 100%; object-fit: cover; }
+    #card { position: fixed; left: 50px; right: 50px; top: 50%; transform: translateY(-50%);
+            text-align: center; }
+    #arabic { color: white; font-size: 5vh; direction: rtl; line-height: 1.6; }
+    #english { color: gray; font-size: 3vh; margin-top: 1vh; }
+    #controls { position: fixed; bottom: 16px; left: 0; right: 0; text-align: center; color: white; }
+    button { font-size: 16px; margin: 0 6px; }
+  </style>
+</head>
+<body>
+  <video id="background" src="{{ background_url }}" autoplay muted loop playsinline></video>
+  <div id="card"><div id="arabic"></div><div id="english"></div></div>
+  <div id="controls">
+    <button id="prev">&#9664;</button>
+    <button id="toggle">Play</button>
+    <button id="next">&#9654;</button>
+    <span id="ref"></span> <a href="{{ url_for('index') }}" style="color: gray">Back</a>
+  </div>
+  <audio id="audio" preload="auto"></audio>
+  <script>
+    // One audio file per ayah: "ended" is the exact verse boundary, so the
+    // text switches with the recitation without any timing guesswork.
+    const verses = {{ verses|tojson }};
+    const audio = document.getElementById("audio");
+    const toggle = document.getElementById("toggle");
+    let current = 0, preload = null;
+
+    function show(i) {
+      current = i;
+      document.getElementById("arabic").textContent = verses[i].arabic;
+      document.getElementById("english").textContent = verses[i].english;
+      document.getElementById("ref").textContent = verses[i].ref + " (" + (i + 1) + "/" + verses.length + ")";
+      audio.src = verses[i].audio;
+      // Warm the browser cache with the next ayah so the switch is gapless
+      if (i + 1 < verses.length) {
+        preload = new Audio(verses[i + 1].audio);
+        preload.preload = "auto";
+      }
+    }
+
+    function go(i, playing) {
+      if (i < 0 || i >= verses.length) return;
+      show(i);
+      if (playing) audio.play();
+    }
+
+    audio.addEventListener("ended", () => {
+      if (current + 1 < verses.length) go(current + 1, true);
+      else toggle.textContent = "Play";
+    });
+    audio.addEventListener("play", () => { toggle.textContent = "Pause"; });
+    audio.addEventListener("pause", () => { toggle.textContent = "Play"; });
+    toggle.addEventListener("click", () => { audio.paused ? audio.play() : audio.pause(); });
+    document.getElementById("prev").addEventListener("click", () => go(current - 1, !audio.paused));
+    document.getElementById("next").addEventListener("click", () => go(current + 1, !audio.paused));
+
+    show(0);
+    audio.play().catch(() => {});   // autoplay may need a click first
+  </script>
+</body>
+</html>
+"""
+
+
+# ---------------- ROUTES ----------------
+@app.route("/")
+def index():
+    return render_template_string(FORM_HTML, surahs=SURAH_LIST, reciters=list(RECITER_URLS),
+                                  backgrounds=background_files())
+
+@app.route("/play")
+def play():
+    reciter = request.args.get("reciter", "")
+    background = request.args.get("background", "")
+    try:
+        surah = int(request.args.get("surah", ""))
+        if surah not in CHAPTERS:
+            raise ValueError(f"There is no surah {surah}")
+        ayahs = parse_selection(request.args.get("range", ""), surah)
+    except ValueError as e:
+        return f"Invalid selection: {e}", 400
+    if reciter not in RECITER_URLS:
+        return "Invalid reciter", 400
+    if background not in background_files():
+        return "Invalid background", 400
+
+    return render_template_string(PLAYER_HTML,
+                                  title=f"{selection_label(ayahs)} - {reciter}",
+                                  background_url=url_for("serve_background", filename=background),
+                                  verses=build_manifest(reciter, ayahs))
+
+@app.route("/manifest")
+def manifest():
+    """The same per-ayah manifest as JSON, e.g. /manifest?reciter=Sudais&selection=2:255"""
+    reciter = request.args.get("reciter", "")
+    if reciter not in RECITER_URLS:
+        abort(404)
+    try:
+        ayahs = parse_selection(request.args.get("selection", ""), 1)
+    except ValueError as e:
+        return f"Invalid selection: {e}", 400
+    return {"reciter": reciter, "verses": build_manifest(reciter, ayahs)}
+
+@app.route("/audio/<reciter>/<name>")
+def serve_audio(reciter, name):
+    if reciter not in RECITER_URLS or len(name) != 10 or not name[:6].isdigit() or not name.endswith(".mp3"):
+        abort(404)
+    surah, verse = int(name[:3]), int(name[3:6])
+    for path in (get_audio_url(reciter, surah, verse), cached_audio_path(reciter, surah, verse)):
+        if os.path.isfile(path):
+            return send_file(path, mimetype="audio/mpeg", max_age=86400)
+    return redirect(get_audio_url(reciter, surah, verse, remote=True))
+
+@app.route("/backgrounds/<filename>")
+def serve_background(filename):
+    if filename not in background_files():
+        abort(404)
+    ext = os.path.splitext(filename)[1].lower()
+    return send_file(os.path.join(BACKGROUNDS_DIR, filename), mimetype=BACKGROUND_TYPES[ext], max_age=86400)
+
+@app.route("/font")
+def serve_font():
+    return send_file(FONT_PATH, mimetype="font/ttf", max_age=86400)
+
+
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -0,0 +1,132 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from catalog import DATA_DIR, get_audio_url
+
+# Per-ayah MP3 cache plus a background prefetcher that fills it while the
+# user is still choosing options. One Prefetcher is shared by every
+# Streamlit session in the process, so the same ayah is never fetched twice.
+
+# ---------------- SETTINGS ----------------
+AUDIO_CACHE_DIR = os.path.join(DATA_DIR, "cache", "audio")
+PREFETCH_WORKERS = 4
+PREFETCH_MAX_AYAHS = 50     # speculative fetches per selection
+CHUNK_SIZE = 256 * 1024
+
+
+# ---------------- AUDIO CACHE ----------------
+def cached_audio_path(reciter, surah, verse):
+    return os.path.join(AUDIO_CACHE_DIR, reciter, f"{surah:03d}{verse:03d}.mp3")
+
+def fetch_ayah(reciter, surah, verse, wanted=lambda: True):
+    """Download one ayah into the cache; returns (path, bytes_fetched).
+
+    Returns (None, bytes_fetched) if wanted() turns False mid-download.
+    Files are written to a .part file and renamed, so readers only ever
+    see complete MP3s.
+    """
+    import requests
+
+    path = cached_audio_path(reciter, surah, verse)
+    if os.path.exists(path):
+        return path, 0
+    url = get_audio_url(reciter, surah, verse)
+    if os.path.isfile(url):
+        # Served from the local mirror
+        return url, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    part = f"{path}.{threading.get_ident()}.part"
+    fetched, complete = 0, False
+    try:
+        with requests.get(url, stream=True, timeout=30) as r:
+            if r.status_code != 200:
+                raise Exception(f"Failed to download {url}")
+            with open(part, "wb") as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    if not wanted():
+                        break
+                    f.write(chunk)
+                    fetched += len(chunk)
+                else:
+                    complete = True
+        if complete:
+            os.replace(part, path)
+            return path, fetched
+        return None, fetched
+    finally:
+        if os.path.exists(part):
+            os.unlink(part)
+
+
+# ---------------- PREFETCHER ----------------
+class PrefetchJob:
+    """Speculative fetch of a set of ayahs; cancel() when the selection changes"""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _Task:
+    def __init__(self):
+        self.jobs = set()
+        self.future = None
+
+
+class Prefetcher:
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        self.tasks = {}     # (reciter, surah, verse) -> _Task in flight
+
+    def _wanted(self, task):
+        with self.lock:
+            return any(not job.cancelled for job in task.jobs)
+
+    def _run(self, key, task):
+        try:
+            if not self._wanted(task):
+                return None, 0
+            return fetch_ayah(*key, wanted=lambda: self._wanted(task))
+        finally:
+            with self.lock:
+                self.tasks.pop(key, None)
+
+    def _submit(self, key, job):
+        """Attach job to the task for key, starting the task if needed"""
+        with self.lock:
+            task = self.tasks.get(key)
+            if task is None:
+                task = self.tasks[key] = _Task()
+                task.jobs.add(job)
+                task.future = self.executor.submit(self._run, key, task)
+            else:
+                task.jobs.add(job)
+            return task.future
+
+    def prefetch(self, reciter, ayahs):
+        """Queue the uncached (surah, ayah) pairs of a selection in the background"""
+        ayahs = list(dict.fromkeys(ayahs))[:PREFETCH_MAX_AYAHS]
+        job = PrefetchJob()
+        for surah, verse in ayahs:
+            if not os.path.exists(cached_audio_path(reciter, surah, verse)):
+                self._submit((reciter, surah, verse), job)
+        return job
+
+    def fetch(self, reciter, surah, verse):
+        """Return (path, bytes_fetched) for an ayah, joining any prefetch in flight"""
+        key = (reciter, surah, verse)
+        if os.path.exists(cached_audio_path(*key)):
+            return cached_audio_path(*key), 0
+        future = self._submit(key, PrefetchJob())
+        path, fetched = future.result()
+        if path is None:
+            # The prefetch was cancelled before this request joined it
+            return fetch_ayah(*key)
+        return path, fetched
+
+
+PREFETCHER = Prefetcher()
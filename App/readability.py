@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+import threading
+from timing import span
+from ffmpeg_tools import run_ffmpeg
+from catalog import DATA_DIR
+
+# Readability filters for bright backgrounds. They are applied by one ffmpeg
+# pass over the background loop and the result is cached under a key of the
+# source file and the filter settings, so each distinct loop frame is
+# filtered once and every render (any length, any output mode) reads the
+# prepared loop like any other background.
+
+# ---------------- SETTINGS ----------------
+PREPARED_DIR = os.path.join(DATA_DIR, "cache", "backgrounds")
+PREPARED_VERSION = 1
+BAND_HEIGHT = 0.4           # the band behind the verse card, as a fraction of frame height
+BLUR_SIGMA = 14
+DARKEN_OPACITY = 0.4
+VIGNETTE_ANGLE = "PI/4"
+READABILITY_FILTERS = ["blur", "darken", "vignette"]
+# Close to the source quality, since the prepared loop is encoded once and reused
+PREPARED_PARAMS = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "16", "-pix_fmt", "yuv420p"]
+
+
+# ---------------- FILTERS ----------------
+def filter_graph(filters):
+    """ffmpeg filter_complex applying the named filters in a fixed order"""
+    top = f"ih*{(1 - BAND_HEIGHT) / 2:.4f}"
+    steps, label = [], "0:v"
+    if "blur" in filters:
+        steps.append(f"[{label}]split[base][band];"
+                     f"[band]crop=iw:trunc(ih*{BAND_HEIGHT}/2)*2:0:trunc({top}/2)*2,gblur=sigma={BLUR_SIGMA}[blurred];"
+                     f"[base][blurred]overlay=0:trunc(H*{(1 - BAND_HEIGHT) / 2:.4f}/2)*2[blur]")
+        label = "blur"
+    if "darken" in filters:
+        steps.append(f"[{label}]drawbox=x=0:y={top}:w=iw:h=ih*{BAND_HEIGHT}:"
+                     f"color=black@{DARKEN_OPACITY}:t=fill[darken]")
+        label = "darken"
+    if "vignette" in filters:
+        steps.append(f"[{label}]vignette=angle={VIGNETTE_ANGLE}[vignette]")
+        label = "vignette"
+    return ";".join(steps), label
+
+def prepared_path(bg_path, filters):
+    stat = os.stat(bg_path)
+    key = json.dumps([PREPARED_VERSION, os.path.basename(bg_path), stat.st_size, int(stat.st_mtime),
+                      sorted(filters), BAND_HEIGHT, BLUR_SIGMA, DARKEN_OPACITY, VIGNETTE_ANGLE,
+                      PREPARED_PARAMS])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    name = os.path.splitext(os.path.basename(bg_path))[0]
+    return os.path.join(PREPARED_DIR, f"{name}-{digest[:16]}.mp4")
+
+
+# ---------------- PREPARE ----------------
+def prepare_background(bg_path, filters, report=None):
+    """Path of the background loop with the readability filters baked in.
+
+    Filters are names from READABILITY_FILTERS; with none the source path
+    is returned unchanged.
+    """
+    filters = [f for f in READABILITY_FILTERS if f in filters]
+    if not filters:
+        return bg_path
+    path = prepared_path(bg_path, filters)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(PREPARED_DIR, exist_ok=True)
+    graph, label = filter_graph(filters)
+    tmp = f"{path}.{threading.get_ident()}.tmp.mp4"
+    with span(report, "prepare_background"):
+        run_ffmpeg("-i", bg_path, "-filter_complex", graph, "-map", f"[{label}]", "-an", *PREPARED_PARAMS, tmp)
+        os.replace(tmp, path)
+    return path
@@ -0,0 +1,206 @@
+"""Per-reciter manifest of which ayah MP3s exist, their sizes and durations.
+
+Built with concurrent HEAD requests and cached in Data/cache/manifests, so
+a render can check its whole selection before downloading anything.
+Surahs are probed on first use; to probe a whole reciter up front:
+
+    python reciter_manifest.py Alafasy
+"""
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from catalog import DATA_DIR, RECITER_URLS, CHAPTERS, get_audio_url
+
+# ---------------- SETTINGS ----------------
+MANIFEST_DIR = os.path.join(DATA_DIR, "cache", "manifests")
+PROBE_WORKERS = 16
+PROBE_TIMEOUT = 15
+# Statuses that mean the file does not exist; anything else but 200 (403,
+# 429, 503 ...) leaves the ayah unknown so its surah is probed again
+MISSING_STATUSES = (404, 410)
+
+# Other known locations of a reciter's files, tried in order when the
+# RECITER_URLS entry does not serve 001001.mp3. The working one is stored in
+# the manifest and copied back into RECITER_URLS when the manifest loads.
+ALTERNATE_URLS = {
+    "Sudais": ["https://archive.org/download/quran-sudais-192/quran-sudais-192/"],
+}
+
+# kbps by bitrate index for MPEG-1 and MPEG-2/2.5 Layer III
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+_locks = {}
+
+
+# ---------------- HELPERS ----------------
+def manifest_path(reciter):
+    return os.path.join(MANIFEST_DIR, f"{reciter}.json")
+
+def ayah_key(surah, verse):
+    return f"{surah:03d}{verse:03d}"
+
+def mp3_bitrate(data):
+    """Bitrate in bits/s of the first MPEG Layer III frame in data, or None"""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        data = data[10 + size:]
+    for i in range(len(data) - 3):
+        if data[i] == 0xFF and data[i + 1] & 0xE0 == 0xE0:
+            version = (data[i + 1] >> 3) & 0x03     # 3 = MPEG-1
+            layer = (data[i + 1] >> 1) & 0x03       # 1 = Layer III
+            index = data[i + 2] >> 4
+            if layer == 1 and 0 < index < 15 and version != 1:
+                return MP3_BITRATES[1 if version == 3 else 2][index] * 1000
+    return None
+
+
+# ---------------- PROBING ----------------
+def probe(session, url):
+    """HEAD one file; returns its size in bytes, or None if it is missing.
+
+    Raises requests.HTTPError for any other answer than 200 or a missing
+    status.
+    """
+    import requests
+
+    if os.path.isfile(url):
+        return os.path.getsize(url)
+    r = session.head(url, allow_redirects=True, timeout=PROBE_TIMEOUT)
+    if r.status_code in MISSING_STATUSES:
+        return None
+    if r.status_code != 200:
+        raise requests.HTTPError(f"HTTP {r.status_code} for {url}", response=r)
+    return int(r.headers.get("Content-Length", 0))
+
+def probe_quietly(session, url):
+    """(size, reached); network errors and unexpected statuses leave the
+    ayah unknown, not missing"""
+    import requests
+
+    try:
+        return probe(session, url), True
+    except requests.RequestException:
+        return None, False
+
+def sample_bitrate(session, url):
+    """Read the start of one file to learn the reciter's MP3 bitrate"""
+    if os.path.isfile(url):
+        with open(url, "rb") as f:
+            return mp3_bitrate(f.read(65536))
+    r = session.get(url, headers={"Range": "bytes=0-65535"}, timeout=PROBE_TIMEOUT)
+    if r.status_code not in (200, 206):
+        return None
+    return mp3_bitrate(r.content[:65536])
+
+def resolve_source(session, reciter):
+    """(base_url, reachable) for the first source that serves 001001.mp3"""
+    candidates = [RECITER_URLS[reciter]] + ALTERNATE_URLS.get(reciter, [])
+    reachable = False
+    for base in candidates:
+        size, reached = probe_quietly(session, f"{base}001001.mp3")
+        reachable = reachable or reached
+        if size is not None:
+            return base, True
+    return RECITER_URLS[reciter], reachable
+
+
+# ---------------- MANIFEST ----------------
+def load_manifest(reciter):
+    path = manifest_path(reciter)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        RECITER_URLS[reciter] = manifest["source"]
+        return manifest
+    return None
+
+def save_manifest(manifest):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(manifest["reciter"])
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def ensure_surahs(reciter, surahs):
+    """Return the reciter's manifest, probing any of surahs not yet in it"""
+    import requests
+
+    with _locks.setdefault(reciter, threading.Lock()):
+        manifest = load_manifest(reciter) or {"reciter": reciter, "bitrate": None,
+                                              "surahs": [], "ayahs": {}}
+        todo = [s for s in surahs if s not in manifest["surahs"]]
+        if not todo:
+            return manifest
+
+        session = requests.Session()
+        source, reachable = resolve_source(session, reciter)
+        RECITER_URLS[reciter] = manifest["source"] = source
+
+        def probe_one(url):
+            # Offline: only mirrored files can be checked, and quickly
+            if not reachable and not os.path.isfile(url):
+                return None, False
+            return probe_quietly(session, url)
+
+        keys = [(s, v) for s in todo for v in range(1, CHAPTERS[s]["total_verses"] + 1)]
+        urls = [get_audio_url(reciter, s, v) for s, v in keys]
+        with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+            results = list(executor.map(probe_one, urls))
+        sizes = [size for size, _ in results]
+
+        if manifest["bitrate"] is None:
+            present = [url for url, size in zip(urls, sizes) if size]
+            if present:
+                manifest["bitrate"] = sample_bitrate(session, present[0])
+
+        unreached = set()
+        for (surah, verse), (size, reached) in zip(keys, results):
+            if not reached:
+                unreached.add(surah)
+                continue
+            entry = {"size": size}
+            if size and manifest["bitrate"]:
+                entry["duration"] = round(size * 8 / manifest["bitrate"], 2)
+            manifest["ayahs"][ayah_key(surah, verse)] = entry
+        # Surahs with unreachable ayahs are probed again next time
+        manifest["surahs"] = sorted(manifest["surahs"] + [s for s in todo if s not in unreached])
+        manifest["probed"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        save_manifest(manifest)
+        return manifest
+
+
+# ---------------- PREFLIGHT ----------------
+def preflight(reciter, ayahs):
+    """Check a (surah, ayah) selection against the manifest before any download.
+
+    Raises if any ayah is missing; otherwise returns (total_bytes, seconds),
+    where seconds is None if the bitrate could not be determined.
+    """
+    manifest = ensure_surahs(reciter, sorted({surah for surah, _ in ayahs}))
+    unknown = [f"{s}:{v}" for s, v in ayahs if ayah_key(s, v) not in manifest["ayahs"]]
+    if unknown:
+        shown = ", ".join(unknown[:10]) + (" ..." if len(unknown) > 10 else "")
+        raise Exception(f"Could not reach {reciter}'s server to check {shown}")
+    entries = [manifest["ayahs"][ayah_key(s, v)] for s, v in ayahs]
+    missing = [f"{s}:{v}" for (s, v), e in zip(ayahs, entries) if not e["size"]]
+    if missing:
+        shown = ", ".join(missing[:10]) + (" ..." if len(missing) > 10 else "")
+        raise Exception(f"{reciter} has no recording for {shown}")
+    total_bytes = sum(e["size"] for e in entries)
+    if all("duration" in e for e in entries):
+        return total_bytes, sum(e["duration"] for e in entries)
+    return total_bytes, None
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(RECITER_URLS):
+        result = ensure_surahs(name, list(CHAPTERS))
+        missing = sum(1 for e in result["ayahs"].values() if not e["size"])
+        print(f"{name}: {len(result['ayahs'])} ayahs, {missing} missing, source {result['source']}")
@@ -0,0 +1,173 @@
+import os
+import re
+import bisect
+import heapq
+import pickle
+from catalog import DATA_DIR, ARABIC_QURAN, ENGLISH_QURAN
+
+# In-memory positional index over the English translation and a normalized
+# Arabic text (no tashkeel or tatweel, one alef, dagger alef written out).
+# Queries are phrases; a trailing "*" makes the last word a prefix, e.g.
+# "lord of the w*".
+
+# ---------------- SETTINGS ----------------
+INDEX_PATH = os.path.join(DATA_DIR, "cache", "search_index.pickle")
+INDEX_VERSION = 3
+
+ARABIC_LETTERS = re.compile(r"[ء-ي]")
+TASHKEEL = re.compile(r"[ؐ-ًؚ-ٰٟۖ-ۭ]")
+TATWEEL = "ـ"
+DAGGER_ALEF = "\u0670"
+# Uthmani letters carrying a dagger alef, spelled as the standard text does:
+# على, الصلاة, and a plain alef everywhere else
+DAGGER_SPELLINGS = [("ى" + DAGGER_ALEF, "ى"), ("و" + DAGGER_ALEF, "ا"), (DAGGER_ALEF, "ا")]
+# Uthmani writes the madda alef as a hamza and an alef (ءامنوا, القرءان)
+HAMZA_ALEF = "ءا"
+ALEF_VARIANTS = str.maketrans({"آ": "ا", "أ": "ا", "إ": "ا",
+                               "ٱ": "ا", "ٲ": "ا", "ٳ": "ا"})
+# Words the standard spelling writes without the alef a dagger alef stands for
+DEFECTIVE_SPELLINGS = {"الرحمان": "الرحمن", "الاه": "اله", "هاذا": "هذا", "هاذه": "هذه",
+                       "هاذان": "هذان", "ذالك": "ذلك", "لاكن": "لكن", "اولائك": "اولئك",
+                       "هاؤلاء": "هؤلاء", "ياايها": "يا ايها"}
+DEFECTIVE = re.compile("|".join(DEFECTIVE_SPELLINGS))
+ENGLISH_WORD = re.compile(r"[a-z0-9']+")
+ARABIC_WORD = re.compile(r"[ء-ي]+")
+
+
+# ---------------- NORMALIZATION ----------------
+def normalize_arabic(text):
+    # The dagger alef is a written long vowel, not a mark: keep it as an alef
+    # so Uthmani spellings match the standard ones (العالمين, not العلمين)
+    for letters, spelling in DAGGER_SPELLINGS:
+        text = text.replace(letters, spelling)
+    text = TASHKEEL.sub("", text).replace(TATWEEL, "").replace(HAMZA_ALEF, "ا")
+    text = text.translate(ALEF_VARIANTS)
+    return DEFECTIVE.sub(lambda m: DEFECTIVE_SPELLINGS[m.group()], text)
+
+def tokenize(text, arabic):
+    if arabic:
+        return ARABIC_WORD.findall(normalize_arabic(text))
+    return ENGLISH_WORD.findall(text.lower().replace("’", "'"))
+
+
+# ---------------- INDEX ----------------
+class SearchIndex:
+    """Positional inverted index; postings are token -> {doc: [positions]}"""
+
+    def __init__(self):
+        self.docs = []          # doc id -> (surah, ayah)
+        self.postings = {True: {}, False: {}}
+        self.words = {True: [], False: []}     # doc id -> token list
+        self.vocab = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for surah in sorted(ARABIC_QURAN, key=int):
+            for a, e in zip(ARABIC_QURAN[surah], ENGLISH_QURAN.get(surah, [])):
+                doc = len(index.docs)
+                index.docs.append((int(surah), a["verse"]))
+                index.add(doc, a["text"], True)
+                index.add(doc, e["text"], False)
+        index.vocab = {arabic: sorted(p) for arabic, p in index.postings.items()}
+        return index
+
+    def add(self, doc, text, arabic):
+        postings = self.postings[arabic]
+        words = tokenize(text, arabic)
+        self.words[arabic].append(words)
+        for pos, token in enumerate(words):
+            postings.setdefault(token, {}).setdefault(doc, []).append(pos)
+
+    def expand_prefix(self, prefix, arabic):
+        vocab = self.vocab[arabic]
+        i = bisect.bisect_left(vocab, prefix)
+        matches = []
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            matches.append(vocab[i])
+            i += 1
+        return matches
+
+    def search(self, query, limit=20):
+        """Return up to limit (surah, ayah) hits containing the phrase"""
+        arabic = bool(ARABIC_LETTERS.search(query))
+        prefix = query.rstrip().endswith("*")
+        tokens = tokenize(query, arabic)
+        if not tokens:
+            return []
+        postings = self.postings[arabic]
+        exact = tokens[:-1] if prefix else tokens
+
+        if not exact:
+            # A single prefix word: merge the completions' sorted doc lists
+            hits, last = [], None
+            completions = self.expand_prefix(tokens[0], arabic)
+            for doc in heapq.merge(*(iter(postings[c]) for c in completions)):
+                if doc != last:
+                    hits.append(self.docs[doc])
+                    last = doc
+                    if len(hits) >= limit:
+                        break
+            return hits
+
+        # Anchor on the rarest exact word, then compare the words around it
+        anchor = min(range(len(exact)), key=lambda i: len(postings.get(exact[i], ())))
+        hits = []
+        # Postings are filled in doc order, so hits come out in Quran order
+        for doc, positions in postings.get(exact[anchor], {}).items():
+            words = self.words[arabic][doc]
+            for pos in positions:
+                start = pos - anchor
+                if start < 0 or start + len(tokens) > len(words):
+                    continue
+                if words[start:start + len(exact)] != exact:
+                    continue
+                if prefix and not words[start + len(exact)].startswith(tokens[-1]):
+                    continue
+                hits.append(self.docs[doc])
+                break
+            if len(hits) >= limit:
+                break
+        return hits
+
+    # ---------------- PERSISTENCE ----------------
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump((INDEX_VERSION, self.docs, self.postings, self.words), f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data[0] != INDEX_VERSION:
+            raise ValueError("stale search index")
+        index = cls()
+        _, index.docs, index.postings, index.words = data
+        index.vocab = {arabic: sorted(p) for arabic, p in index.postings.items()}
+        return index
+
+
+def get_index():
+    """The prebuilt index from INDEX_PATH if there is one, else a fresh build"""
+    if os.path.exists(INDEX_PATH):
+        try:
+            return SearchIndex.load()
+        except (ValueError, pickle.UnpicklingError):
+            pass
+    return SearchIndex.build()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    if sys.argv[1:] == ["--build"]:
+        SearchIndex.build().save()
+        print(f"Wrote {INDEX_PATH}")
+    else:
+        index = get_index()
+        t0 = time.perf_counter()
+        hits = index.search(" ".join(sys.argv[1:]))
+        print(f"{len(hits)} hits in {(time.perf_counter() - t0) * 1000:.3f} ms")
+        for surah, ayah in hits:
+            print(f"  {surah}:{ayah}")
@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+import functools
+from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip
+from moviepy.video.fx.loop import loop
+import layout
+from timing import span, count
+from catalog import DATA_DIR, FONT_PATH
+from prefetch import PREFETCHER
+from ffmpeg_tools import concat_copy
+from pipeline import CARD_MARGIN, CARD_HEIGHT, verse_texts, card_clip
+
+# Library of one pre-rendered MP4 per ayah for each (style, background).
+# Segments are named by a hash of their content (audio bytes, verse text,
+# style), so a verse repeated with identical audio is encoded once. Every
+# segment restarts the background loop at its own t=0 and is encoded with
+# the same closed-GOP settings, so any range is assembled by stream-copy
+# concatenation instead of a new encode.
+
+# ---------------- SETTINGS ----------------
+SEGMENTS_DIR = os.path.join(DATA_DIR, "cache", "segments")
+SEGMENT_VERSION = 2
+AUDIO_RATE = 44100
+# Identical for every segment so the concat demuxer can copy the streams
+SEGMENT_PARAMS = ["-pix_fmt", "yuv420p", "-sc_threshold", "0", "-flags", "+cgop", "-ac", "2"]
+
+
+# ---------------- HELPERS ----------------
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, int(stat.st_mtime)]
+
+@functools.lru_cache(maxsize=4096)
+def _content_hash(path, size, mtime):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_hash(path):
+    """sha1 of a file's bytes, remembered until the file changes"""
+    stat = os.stat(path)
+    return _content_hash(path, stat.st_size, stat.st_mtime_ns)
+
+def segment_path(audio_path, arabic, english, bg_path, font_path=FONT_PATH, palette=None):
+    key = json.dumps([SEGMENT_VERSION, content_hash(audio_path), arabic, english,
+                      file_fingerprint(bg_path), os.path.basename(font_path),
+                      CARD_MARGIN, CARD_HEIGHT, layout.style_key(palette=palette)], ensure_ascii=False)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(SEGMENTS_DIR, digest[:2], f"{digest}.mp4")
+
+
+# ---------------- SEGMENTS ----------------
+def render_segment(reciter, surah, verse, bg_path, font_path=FONT_PATH, report=None, palette=None):
+    """Render one ayah with its audio into the library; returns its path"""
+    audio_path, fetched = PREFETCHER.fetch(reciter, surah, verse)
+    count(report, "bytes_fetched", fetched)
+    arabic, english = verse_texts(surah, verse)
+    path = segment_path(audio_path, arabic, english, bg_path, font_path, palette)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    audio_clip = AudioFileClip(audio_path)
+    bg_clip = VideoFileClip(bg_path)
+    background = loop(bg_clip, duration=audio_clip.duration)
+
+    card = card_clip(arabic, english, bg_clip.size[0]-CARD_MARGIN, CARD_HEIGHT, font_path, palette)
+    text_clip = card.set_duration(audio_clip.duration).set_position("center")
+    clip = CompositeVideoClip([background, text_clip]).set_audio(audio_clip)
+
+    fps = bg_clip.fps
+    tmp = f"{path}.{os.getpid()}.tmp.mp4"
+    clip.write_videofile(tmp, fps=fps, codec="libx264", audio_codec="aac", audio_fps=AUDIO_RATE,
+                         preset="ultrafast", threads=4, logger=None,
+                         ffmpeg_params=SEGMENT_PARAMS + ["-g", str(int(round(fps)))])
+    count(report, "frames_encoded", int(round(clip.duration * fps)))
+    clip.close()
+    bg_clip.close()
+    os.replace(tmp, path)
+    return path
+
+def assemble_video(reciter, ayahs, bg_path, output_path, font_path=FONT_PATH,
+                   progress_bar=None, report=None, palette=None):
+    """Render missing ayah segments, then stream-copy them into output_path"""
+    paths = []
+    with span(report, "render_segments"):
+        for i, (surah, verse) in enumerate(ayahs):
+            paths.append(render_segment(reciter, surah, verse, bg_path, font_path, report, palette))
+            if progress_bar:
+                progress_bar.progress((i+1)/len(ayahs))
+
+    with span(report, "concat_segments"):
+        concat_copy(paths, output_path, "-movflags", "+faststart")
+    return output_path
@@ -0,0 +1,140 @@
+import os
+import tempfile
+from PIL import ImageColor, ImageFont
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+import layout
+from timing import span, count
+from ffmpeg_tools import run_ffmpeg
+from catalog import FONT_PATH, FONTS_DIR
+from pipeline import CARD_MARGIN, CARD_HEIGHT, verse_texts, is_aac
+
+# Verse text as a timed subtitle track instead of pixels. The track is
+# muxed next to the looped background, which is stream-copied, or burned
+# in with ffmpeg's libass filter when a hard-sub is needed.
+
+# ---------------- SETTINGS ----------------
+SUBTITLE_FORMATS = ["ass", "vtt", "srt"]
+# Subtitle codec per container; MP4 only carries 3GPP timed text
+SUBTITLE_CODECS = {
+    ".mp4": {"ass": "mov_text", "vtt": "mov_text", "srt": "mov_text"},
+    ".mkv": {"ass": "ass", "vtt": "webvtt", "srt": "srt"},
+}
+
+
+# ---------------- CUES ----------------
+def build_cues(ayahs, timings):
+    """(start, end, arabic, english) for every ayah"""
+    return [(start, end, *verse_texts(surah, verse)) for (surah, verse), (start, end) in zip(ayahs, timings)]
+
+def clock(seconds, separator):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separator}{ms:03d}"
+
+def to_srt(cues):
+    blocks = []
+    for i, (start, end, arabic, english) in enumerate(cues, 1):
+        blocks.append(f"{i}\n{clock(start, ',')} --> {clock(end, ',')}\n{arabic}\n{english}\n")
+    return "\n".join(blocks)
+
+def to_vtt(cues):
+    blocks = ["WEBVTT\n"]
+    for start, end, arabic, english in cues:
+        blocks.append(f"{clock(start, '.')} --> {clock(end, '.')}\n{arabic}\n{english}\n")
+    return "\n".join(blocks)
+
+def ass_color(color):
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def ass_text(text):
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")").replace("\n", " ")
+
+def to_ass(cues, width, height, font_path=FONT_PATH, palette=None):
+    """Styled track matching the verse cards: centered Arabic over English,
+    each cue sized with the same fit as its card"""
+    family = ImageFont.truetype(font_path, layout.MAX_FONT_SIZE).getname()[0]
+    margin = CARD_MARGIN // 2
+    en_size = layout.english_size(layout.MAX_FONT_SIZE)
+    arabic_color, english_color, outline, outline_color = palette or layout.DEFAULT_PALETTE
+    # libass always draws at least the default 2px outline
+    style = ("Style: {},{},{},{},&H000000FF," + ass_color(outline_color or "black") + ",&H80000000,"
+             "0,0,0,0,100,100,0,0,1," + str(max(2, outline)) + ",1,5,{},{},0,1")
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+        "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        style.format("Arabic", family, layout.MAX_FONT_SIZE, ass_color(arabic_color), margin, margin),
+        style.format("English", family, en_size, ass_color(english_color), margin, margin),
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    engine = layout.resolve_engine()
+    for start, end, arabic, english in cues:
+        start, end = clock(start, ".")[1:-1], clock(end, ".")[1:-1]   # H:MM:SS.cc
+        size = layout.fit_font_size(arabic, english, font_path, width - CARD_MARGIN, CARD_HEIGHT, engine)
+        text = (f"{{\\fs{size}}}{ass_text(arabic)}"
+                f"\\N{{\\rEnglish\\fs{layout.english_size(size)}}}{ass_text(english)}")
+        lines.append(f"Dialogue: 0,{start},{end},Arabic,,0,0,0,,{text}")
+    return "\n".join(lines) + "\n"
+
+def write_subtitles(cues, path, fmt, size=(1280, 720), font_path=FONT_PATH, palette=None):
+    if fmt == "ass":
+        text = to_ass(cues, *size, font_path, palette)
+    elif fmt == "vtt":
+        text = to_vtt(cues)
+    elif fmt == "srt":
+        text = to_srt(cues)
+    else:
+        raise ValueError(f"Unknown subtitle format {fmt!r}; use one of {', '.join(SUBTITLE_FORMATS)}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+# ---------------- MUXING ----------------
+def filter_path(path):
+    """Quote a path for use inside an ffmpeg filter argument"""
+    return "'" + path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'") + "'"
+
+def render_with_subtitles(bg_path, audio_path, cues, output_path, fmt="ass", burn=False,
+                          font_path=FONT_PATH, report=None, palette=None):
+    """Loop the background under the audio with the verses as a subtitle track.
+
+    Soft subtitles stream-copy the background and become a subtitle stream
+    (the codec follows the output extension, see SUBTITLE_CODECS). burn=True
+    draws them into the frames with libass, which needs a video encode.
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if not burn and ext not in SUBTITLE_CODECS:
+        raise ValueError(f"Soft subtitles need an .mp4 or .mkv output, not {ext!r}")
+    info = ffmpeg_parse_infos(bg_path)
+    duration = ffmpeg_parse_infos(audio_path)["duration"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        track = write_subtitles(cues, os.path.join(tmp, f"verses.{fmt}"), fmt, info["video_size"], font_path,
+                                palette)
+        args = ["-stream_loop", "-1", "-i", bg_path, "-i", audio_path]
+        if burn:
+            vf = f"subtitles={filter_path(track)}:fontsdir={filter_path(FONTS_DIR)}"
+            args += ["-map", "0:v:0", "-map", "1:a:0", "-vf", vf,
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+        else:
+            args += ["-i", track, "-map", "0:v:0", "-map", "1:a:0", "-map", "2:s:0",
+                    "-c:v", "copy", "-c:s", SUBTITLE_CODECS[ext][fmt]]
+        args += ["-c:a", "copy" if is_aac(audio_path) else "aac", "-t", f"{duration:.3f}", output_path]
+        with span(report, "burn_subtitles" if burn else "mux_subtitles"):
+            run_ffmpeg(*args)
+    if burn:
+        count(report, "frames_encoded", int(round(duration * info["video_fps"])))
+    return output_path
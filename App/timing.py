@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import logging
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ---------------- LOGGING ----------------
+logger = logging.getLogger("quran.render")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+# ---------------- HELPERS ----------------
+def cpu_seconds():
+    """CPU time of this process plus its waited-for children (ffmpeg)"""
+    cpu = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+def rss_mb():
+    """Current resident memory of this process, or the peak where unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return peak_rss_mb()
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+def span(report, name):
+    """report.span(name), or a no-op when no report is being collected"""
+    if report is None:
+        return contextlib.nullcontext()
+    return report.span(name)
+
+def count(report, name, amount):
+    if report is not None:
+        report.count(name, amount)
+
+
+# ---------------- RENDER REPORT ----------------
+class RenderReport:
+    """Wall time, CPU time (ffmpeg included) and RSS per stage of one render job"""
+
+    def __init__(self, job):
+        self.job = job
+        self.spans = []
+        self.counters = {"bytes_fetched": 0, "frames_encoded": 0}
+        self.started = time.time()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        wall, cpu, rss = time.perf_counter(), cpu_seconds(), rss_mb()
+        try:
+            yield
+        finally:
+            end_rss = rss_mb()
+            self.spans.append({
+                "stage": name,
+                "wall_s": round(time.perf_counter() - wall, 3),
+                "cpu_s": round(cpu_seconds() - cpu, 3),
+                "rss_mb": end_rss,
+                "rss_delta_mb": round(end_rss - rss, 1) if end_rss is not None else None,
+            })
+
+    def count(self, name, amount):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def total_wall(self):
+        return round(sum(s["wall_s"] for s in self.spans), 3)
+
+    def to_dict(self):
+        return {
+            "job": self.job,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "total_wall_s": self.total_wall(),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.spans,
+            **self.counters,
+        }
+
+    def log(self):
+        """Write the report as one structured JSON log line"""
+        logger.info(json.dumps(self.to_dict()))
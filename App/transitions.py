@@ -0,0 +1,59 @@
+import numpy as np
+
+# Verse card transitions as per-frame lookup tables. Everything that
+# depends on time (which ayah is showing, how far its card has faded, slid
+# or been revealed) is worked out for every output frame up front with
+# array ops, so the frame loop only reads three numbers and the blend
+# skips all of it on frames where the card is fully in. The "word"
+# transition shows the card at once and uncovers its Arabic words in
+# reading order, from a per-frame count of words shown.
+
+# ---------------- SETTINGS ----------------
+TRANSITIONS = ["none", "fade", "slide", "wipe", "word"]
+TRANSITION_SECONDS = 0.3    # ramp length at each end of an ayah
+SLIDE_DISTANCE = 0.06       # slide offset at the start of the ramp, as a fraction of frame height
+WORD_REVEAL_SHARE = 0.8     # share of an ayah over which the "word" transition uncovers its words
+
+
+# ---------------- TABLES ----------------
+def transition_table(kind, timings, fps, n_frames):
+    """Per-frame (verse, opacity, shift, reveal) arrays for a transition.
+
+    verse is the ayah index at each frame; opacity and reveal run 0..1;
+    shift is the slide offset as a fraction of SLIDE_DISTANCE.
+    """
+    if kind not in TRANSITIONS:
+        raise ValueError(f"Unknown transition {kind!r}; use one of {', '.join(TRANSITIONS)}")
+    t = np.arange(n_frames) / fps
+    starts = np.array([start for start, _ in timings])
+    ends = np.array([end for _, end in timings])
+    verse = np.clip(np.searchsorted(starts, t, side="right") - 1, 0, len(timings) - 1)
+
+    ones = np.ones(n_frames, dtype=np.float32)
+    if kind in ("none", "word"):
+        return verse, ones, np.zeros(n_frames, dtype=np.float32), ones
+    edge = np.minimum(t - starts[verse], ends[verse] - t)
+    ramp = np.clip(edge / TRANSITION_SECONDS, 0, 1)
+    ramp = (ramp * ramp * (3 - 2 * ramp)).astype(np.float32)     # smoothstep
+    if kind == "fade":
+        return verse, ramp, np.zeros(n_frames, dtype=np.float32), ones
+    if kind == "slide":
+        return verse, ramp, 1 - ramp, ones
+    return verse, ones, np.zeros(n_frames, dtype=np.float32), ramp
+
+def word_reveal_table(kind, timings, verses, word_counts, fps):
+    """Number of Arabic words uncovered at every output frame.
+
+    verses is the per-frame ayah index from transition_table and
+    word_counts the number of word boxes per ayah. Returns None for
+    transitions that show whole cards.
+    """
+    if kind != "word":
+        return None
+    t = np.arange(len(verses)) / fps
+    starts = np.array([start for start, _ in timings])[verses]
+    ends = np.array([end for _, end in timings])[verses]
+    progress = np.clip((t - starts) / np.maximum((ends - starts) * WORD_REVEAL_SHARE, 1e-6), 0, 1)
+    counts = np.array(word_counts, dtype=np.int32)[verses]
+    # The first word is there as the ayah starts, the last one at WORD_REVEAL_SHARE
+    return np.minimum(counts, (progress * counts).astype(np.int32) + 1)
@@ -0,0 +1,90 @@
+import subprocess
+import numpy as np
+from ffmpeg_tools import ffmpeg_binary
+
+# Recitation visualizer drawn under the verse text. The whole track is
+# decoded once and turned into one row of band levels per output frame with
+# a chunked NumPy STFT; drawing a frame is then a lookup plus one masked
+# blend over the bar strip.
+
+# ---------------- SETTINGS ----------------
+VIS_RATE = 22050
+VIS_FFT = 2048
+VIS_BANDS = 32
+VIS_FREQS = (80, 8000)      # band edges, log-spaced between these
+VIS_RANGE_DB = 45           # levels this far below the track's peak read as silence
+VIS_CHUNK = 1024            # STFT frames per batch, bounds memory on long tracks
+VIS_COLOR = (255, 255, 255)
+VIS_OPACITY = 0.7
+VIS_WIDTH = 0.6             # strip size and bottom margin, as fractions of the frame
+VIS_HEIGHT = 0.12
+VIS_MARGIN = 0.05
+VIS_GAP = 0.3               # fraction of each bar's slot left empty
+BAR_RGB = np.array(VIS_COLOR, dtype=np.int16)
+
+
+# ---------------- ANALYSIS ----------------
+def decode_mono(audio_path, rate=VIS_RATE):
+    cmd = [ffmpeg_binary(), "-v", "error", "-i", audio_path,
+           "-f", "f32le", "-ac", "1", "-ar", str(rate), "-"]
+    pcm = subprocess.run(cmd, check=True, capture_output=True).stdout
+    return np.frombuffer(pcm, dtype=np.float32)
+
+def band_matrix(rate=VIS_RATE, n_fft=VIS_FFT, bands=VIS_BANDS, freqs=VIS_FREQS):
+    """(bins, bands) 0/1 matrix summing FFT bins into log-spaced bands"""
+    edges = np.geomspace(*freqs, bands + 1) * n_fft / rate
+    lo = np.floor(edges[:-1]).astype(int)
+    hi = np.maximum(np.floor(edges[1:]).astype(int), lo + 1)
+    bins = np.arange(n_fft // 2 + 1)[:, None]
+    return ((bins >= lo) & (bins < hi)).astype(np.float32)
+
+def band_levels(audio_path, fps, bands=VIS_BANDS, rate=VIS_RATE, n_fft=VIS_FFT):
+    """(frames, bands) array of 0..1 levels, one row per output frame"""
+    signal = decode_mono(audio_path, rate)
+    n_frames = int(len(signal) / rate * fps)
+    if n_frames == 0:
+        return np.zeros((0, bands), dtype=np.float32)
+    padded = np.pad(signal, n_fft // 2)
+    centers = np.round(np.arange(n_frames) * rate / fps).astype(int)
+    window = np.hanning(n_fft).astype(np.float32)
+    weights = band_matrix(rate, n_fft, bands)
+    offsets = np.arange(n_fft)
+
+    energy = np.empty((n_frames, bands), dtype=np.float32)
+    for i in range(0, n_frames, VIS_CHUNK):
+        frames = padded[centers[i:i + VIS_CHUNK, None] + offsets] * window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        energy[i:i + VIS_CHUNK] = power @ weights
+
+    db = 10 * np.log10(energy + 1e-10)
+    levels = np.clip((db - db.max() + VIS_RANGE_DB) / VIS_RANGE_DB, 0, 1)
+    # Light smoothing over time so the bars don't flicker frame to frame
+    kernel = np.array([0.25, 0.5, 0.25], dtype=np.float32)
+    padded_levels = np.pad(levels, ((1, 1), (0, 0)), mode="edge")
+    return (kernel[0] * padded_levels[:-2] + kernel[1] * padded_levels[1:-1]
+            + kernel[2] * padded_levels[2:]).astype(np.float32)
+
+
+# ---------------- DRAWING ----------------
+def bar_strip(frame_w, frame_h, bands=VIS_BANDS):
+    """Geometry of the bar strip: (x, y, w, h, band index per column, row index)"""
+    w = int(frame_w * VIS_WIDTH) // bands * bands
+    h = max(1, int(frame_h * VIS_HEIGHT))
+    x = (frame_w - w) // 2
+    y = frame_h - int(frame_h * VIS_MARGIN) - h
+    slot = w // bands
+    columns = np.arange(w)
+    band = columns // slot
+    # Gap columns point at an extra band that never lights up
+    band[columns % slot >= max(1, int(slot * (1 - VIS_GAP)))] = bands
+    return x, y, w, h, band, np.arange(h)[:, None]
+
+def draw_bars(frame, levels, strip):
+    """Blend one row of band levels onto frame in place as bars"""
+    x, y, w, h, band, rows = strip
+    tops = np.append(h - levels * h, h)
+    mask = rows >= tops[band]
+    region = frame[y:y + h, x:x + w]
+    lit = region[mask]
+    region[mask] = lit - ((lit - BAR_RGB) * VIS_OPACITY).astype(np.int16)
+    return frame